@@ -1,29 +1,78 @@
-from flask import Flask, render_template, request, abort
+import os
+import re
+import json
+import time
+import queue
+from flask import (
+    Flask, Response, render_template, request, abort, make_response, jsonify,
+    send_file, url_for, stream_with_context, g
+)
 from emotion_utils import (
-    load_all_sessions,
+    list_sessions,
+    list_session_ids,
+    count_sessions,
     load_session,
-    load_emotion_images
+    load_session_metrics,
+    load_all_metrics,
+    grade_for,
+    data_etag,
+    data_last_modified,
+    load_emotion_manifest,
+    load_emotion_page,
+    load_archive,
+    is_archived,
+    archive_path,
+    emotion_dir,
+    EMOTIONS
 )
+from live import LiveHub
+from profiling import Profiler, compact_profile
+
+# numpy (timeline) and cv2 (image_writer) are imported inside the routes
+# that need them, so the dashboard starts without loading either
+
+SESSIONS_PER_PAGE = 50
+MAX_TIMELINE_BUCKETS = 2000
+GALLERY_PAGE_SIZE = 24
+THUMB_MAX_AGE = 365 * 24 * 3600
+# archived images change when retention re-encodes them, so not immutable
+ARCHIVE_MAX_AGE = 24 * 3600
+
+SAFE_ID = re.compile(r"[\w-]+")
+SAFE_IMAGE = re.compile(r"[0-9a-f]+\.jpg")
+
+SSE_HEARTBEAT = 15
+METRICS_RECENT_SESSIONS = 20
+
+live_hub = LiveHub()
+
+# time spent in each view of this process, reported by /metrics
+route_profiler = Profiler()
 
 app = Flask(__name__)
 
+
 # ==============================
-# SUGGESTIONS & METRICS
+# REQUEST TIMING
 # ==============================
-def compute_suggestions(session):
-    counts = session["emotion_counts"]
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
 
-    focused = counts.get("focused", 0)
-    laughing = counts.get("laughing", 0)
-    bored = counts.get("bored", 0)
-    sad = counts.get("sad", 0)
-    phone = counts.get("using_phone", 0)
 
-    total = max(focused + laughing + bored + sad + phone, 1)
+@app.after_request
+def record_timing(response):
+    started = g.pop("started", None)
+    if started is not None and request.endpoint:
+        route_profiler.record(request.endpoint, time.perf_counter() - started)
+    return response
 
-    engaged = focused + laughing
-    engaged_ratio = engaged / total
-    phone_ratio = phone / total
+# ==============================
+# SUGGESTIONS & METRICS
+# ==============================
+def compute_suggestions(metrics):
+    engaged_ratio = metrics["engaged_ratio"]
+    phone_ratio = metrics["phone_ratio"]
 
     suggestions = []
 
@@ -43,18 +92,46 @@ def compute_suggestions(session):
     }
 
 
+# ==============================
+# CONDITIONAL RESPONSES (ETag / Last-Modified)
+# ==============================
+def conditional(render):
+    """Answer 304 when the session data has not changed since last visit."""
+    etag = data_etag()
+    last_modified = data_last_modified()
+
+    if request.if_none_match.contains(etag) or (
+        not request.if_none_match
+        and request.if_modified_since
+        and last_modified <= request.if_modified_since
+    ):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
 # ==============================
 # HOME – LIST ALL SESSIONS
 # ==============================
 @app.route("/")
 def home():
-    sessions = load_all_sessions()
-    sessions_sorted = sorted(
-        sessions,
-        key=lambda x: x["saved_at"],
-        reverse=True
-    )
-    return render_template("base.html", sessions=sessions_sorted)
+    page = max(request.args.get("page", 1, type=int), 1)
+    total = count_sessions()
+    pages = max((total + SESSIONS_PER_PAGE - 1) // SESSIONS_PER_PAGE, 1)
+
+    # newest first, sorted and paginated by the store
+    return conditional(lambda: render_template(
+        "base.html",
+        sessions=list_sessions(page=page, per_page=SESSIONS_PER_PAGE),
+        total_sessions=total,
+        page=page,
+        pages=pages
+    ))
 
 
 # ==============================
@@ -69,8 +146,11 @@ def dashboard(session_id):
     labels = list(session["emotion_counts"].keys())
     values = list(session["emotion_counts"].values())
 
-    suggestions, stats = compute_suggestions(session)
-    images = load_emotion_images(session_id)
+    suggestions, stats = compute_suggestions(load_session_metrics(session_id))
+    image_counts = {
+        emo: len(names)
+        for emo, names in load_emotion_manifest(session_id).items()
+    }
 
     return render_template(
         "dashboard.html",
@@ -79,11 +159,175 @@ def dashboard(session_id):
         values=values,
         stats=stats,
         suggestions=suggestions,
-        images=images,
-        session_list=load_all_sessions()
+        image_counts=image_counts,
+        session_list=[{"session_id": sid} for sid in list_session_ids()]
     )
 
 
+# ==============================
+# SESSION TIMELINE (downsampled)
+# ==============================
+@app.route("/session/<session_id>/timeline")
+def session_timeline(session_id):
+    if not load_session(session_id):
+        abort(404)
+
+    buckets = request.args.get("buckets", 120, type=int)
+    buckets = min(max(buckets, 1), MAX_TIMELINE_BUCKETS)
+
+    from timeline import load_events, downsample
+
+    events = load_events(session_id)
+    if events is None:
+        return jsonify({"buckets": 0, "total_events": 0, "counts": {}, "start": []})
+
+    return jsonify(downsample(events, buckets))
+
+
+# ==============================
+# EVIDENCE GALLERY (paginated, thumbnails)
+# ==============================
+@app.route("/session/<session_id>/gallery/<emotion>")
+def gallery(session_id, emotion):
+    if emotion not in EMOTIONS or not SAFE_ID.fullmatch(session_id):
+        abort(404)
+
+    page = request.args.get("page", 1, type=int)
+    result = load_emotion_page(session_id, emotion, page, GALLERY_PAGE_SIZE)
+
+    if is_archived(session_id):
+        result["images"] = [
+            {
+                "thumb": url_for("archived_image", session_id=session_id,
+                                 emotion=emotion, name=name, part="thumb"),
+                "full": url_for("archived_image", session_id=session_id,
+                                emotion=emotion, name=name, part="full")
+            }
+            for name in result["images"]
+        ]
+        return jsonify(result)
+
+    result["images"] = [
+        {
+            "thumb": url_for("thumbnail", session_id=session_id,
+                             emotion=emotion, name=name),
+            "full": f"/static/emotions/{session_id}/{emotion}/{name}"
+        }
+        for name in result["images"]
+    ]
+    return jsonify(result)
+
+
+@app.route("/thumbs/<session_id>/<emotion>/<name>")
+def thumbnail(session_id, emotion, name):
+    if (emotion not in EMOTIONS or not SAFE_ID.fullmatch(session_id)
+            or not SAFE_IMAGE.fullmatch(name)):
+        abort(404)
+
+    image_path = os.path.join(emotion_dir(session_id, emotion), name)
+    if not os.path.exists(image_path):
+        abort(404)
+
+    from image_writer import ensure_thumbnail
+
+    path = ensure_thumbnail(image_path)
+    if path is None:
+        abort(404)
+
+    # image names are random uuids, so a thumbnail never changes
+    response = send_file(os.path.abspath(path), max_age=THUMB_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+
+# ==============================
+# ARCHIVED IMAGES (one ranged read from the session pack)
+# ==============================
+@app.route("/archive/<session_id>/<emotion>/<name>/<part>")
+def archived_image(session_id, emotion, name, part):
+    if (emotion not in EMOTIONS or not SAFE_ID.fullmatch(session_id)
+            or part not in ("thumb", "full")):
+        abort(404)
+
+    archive = load_archive(session_id)
+    entry = archive and archive[1].get((emotion, name))
+    if not entry:
+        abort(404)
+
+    # full frames are dropped once a session reaches the thumbnail tier
+    span = entry.get(part) or entry["thumb"]
+    path = archive_path(session_id)
+    etag = f"{session_id}-{os.stat(path).st_mtime_ns}-{name}-{part}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        from image_pack import read_blob
+        response = Response(read_blob(path, span), mimetype="image/jpeg")
+
+    response.set_etag(etag)
+    response.cache_control.max_age = ARCHIVE_MAX_AGE
+    return response
+
+
+@app.route("/archive/<session_id>.pack")
+def archive_file(session_id):
+    """The whole pack; clients may fetch single images with Range headers."""
+    if not SAFE_ID.fullmatch(session_id):
+        abort(404)
+    path = archive_path(session_id)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(os.path.abspath(path), mimetype="application/octet-stream",
+                     conditional=True, max_age=ARCHIVE_MAX_AGE)
+
+
+# ==============================
+# LIVE SESSIONS (Server-Sent Events)
+# ==============================
+@app.route("/live")
+def live_sessions():
+    return render_template("live.html", session_id=None,
+                           active=live_hub.active_sessions())
+
+
+@app.route("/live/<session_id>")
+def live_dashboard(session_id):
+    if not SAFE_ID.fullmatch(session_id):
+        abort(404)
+    return render_template("live.html", session_id=session_id,
+                           active=live_hub.active_sessions())
+
+
+@app.route("/live/<session_id>/stream")
+def live_stream(session_id):
+    if not SAFE_ID.fullmatch(session_id):
+        abort(404)
+
+    q = live_hub.subscribe(session_id)
+
+    def events():
+        try:
+            while True:
+                try:
+                    message = q.get(timeout=SSE_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield f"event: {message.get('type', 'update')}\n"
+                yield f"data: {json.dumps(message)}\n\n"
+                if message.get("type") == "end":
+                    break
+        finally:
+            live_hub.unsubscribe(session_id, q)
+
+    response = Response(stream_with_context(events()),
+                        mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 # ==============================
 # COMPARE TWO SESSIONS
 # ==============================
@@ -112,43 +356,22 @@ def compare():
 # ==============================
 @app.route("/analytics")
 def analytics():
-    sessions = load_all_sessions()
+    return conditional(render_analytics)
 
-    session_ids = []
-    engagement_scores = []
-    phone_scores = []
 
-    for s in sessions:
-        counts = s["emotion_counts"]
+def render_analytics():
+    # per-session metrics are precomputed and cached in emotion_utils
+    metrics = load_all_metrics()
 
-        focused = counts.get("focused", 0)
-        laughing = counts.get("laughing", 0)
-        bored = counts.get("bored", 0)
-        sad = counts.get("sad", 0)
-        phone = counts.get("using_phone", 0)
-
-        total = max(focused + laughing + bored + sad + phone, 1)
-        engaged = focused + laughing
-
-        engagement = round((engaged / total) * 100, 2)
-        phone_ratio = round((phone / total) * 100, 2)
-
-        session_ids.append(s["session_id"])
-        engagement_scores.append(engagement)
-        phone_scores.append(phone_ratio)
+    session_ids = [sid for sid, _ in metrics]
+    engagement_scores = [m["engagement"] for _, m in metrics]
+    phone_scores = [m["phone_percent"] for _, m in metrics]
 
     # ✅ CLASS AVERAGE
     avg_engagement = round(sum(engagement_scores) / max(len(engagement_scores), 1), 2)
 
     # ✅ CLASS GRADE
-    if avg_engagement >= 80:
-        grade = "A (Excellent)"
-    elif avg_engagement >= 65:
-        grade = "B (Good)"
-    elif avg_engagement >= 50:
-        grade = "C (Average)"
-    else:
-        grade = "D (Poor)"
+    grade = grade_for(avg_engagement)
 
     return render_template(
         "analytics.html",
@@ -159,6 +382,35 @@ def analytics():
         grade=grade,
         total_sessions=len(session_ids)
     )
+
+
+# ==============================
+# METRICS
+# ==============================
+@app.route("/metrics")
+def metrics():
+    """
+    Route latencies of this dashboard process, the headline profile of
+    every live session and of the most recently saved ones.
+    """
+    live = {}
+    for session_id in live_hub.active_sessions():
+        message = live_hub.latest(session_id) or {}
+        live[session_id] = message.get("profile")
+
+    recent = {}
+    for session in list_sessions(page=1, per_page=METRICS_RECENT_SESSIONS):
+        profile = session.get("pipeline", {}).get("profile")
+        if profile:
+            recent[session["session_id"]] = compact_profile(profile)
+
+    return jsonify({
+        "routes": route_profiler.summary()["stages"],
+        "live_sessions": live,
+        "recent_sessions": recent
+    })
+
+
 @app.route("/founders")
 def founders():
     return render_template("founders.html")
@@ -0,0 +1,389 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+from emotion_utils import (
+    create_session_id,
+    init_emotion_counts,
+    save_session_summary,
+    emotion_dir,
+    scan_emotion_dir,
+    EMOTIONS
+)
+from pipeline import as_face_results
+from scheduler import DetectionScheduler
+from image_writer import EvidenceWriter, dhash, hamming, thumbnail_path
+from face_tracker import FaceTracker
+from timeline import EVENT_DTYPE, EMOTION_INDEX, timeline_path, TIMELINE_DIR
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+BATCH_DIR = os.path.join("data", "batch")
+
+CHUNK_SECONDS = 60
+EMOTION_INTERVAL = 0.8        # seconds of video between emotion samples
+PHONE_INTERVAL = 0.8          # seconds of video between phone samples
+MAX_DETECT_INTERVAL = 5.0
+
+# same per-session budget as a live session, split across the chunks
+MAX_IMAGES = 300
+HASH_DISTANCE = 6
+
+# ===============================
+# PLANNING
+# ===============================
+def find_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(
+                    os.path.join(root, f) for f in sorted(files)
+                    if f.lower().endswith(VIDEO_EXTENSIONS)
+                )
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print("Skipping missing path:", path)
+    return videos
+
+def video_info(path):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    # some containers (often .webm) do not report a frame count; take
+    # it from the timestamp of the last frame instead of reading them all
+    if frames <= 0 and cap.set(cv2.CAP_PROP_POS_AVI_RATIO, 1):
+        last_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if last_ms > 0:
+            frames = int(round(last_ms / 1000 * fps)) + 1
+
+    cap.release()
+    return fps, max(frames, 0)
+
+def plan_chunks(frame_count, fps, chunk_seconds=CHUNK_SECONDS):
+    size = max(int(fps * chunk_seconds), 1)
+    return [[start, min(start + size, frame_count)]
+            for start in range(0, frame_count, size)]
+
+def job_key(path):
+    st = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+# ===============================
+# RESUMABLE JOB STATE
+# data/batch/<key>.json records the session id and finished chunks
+# ===============================
+def state_path(key):
+    return os.path.join(BATCH_DIR, f"{key}.json")
+
+def parts_dir(key):
+    return os.path.join(BATCH_DIR, key)
+
+def staging_dir(key, index):
+    """A chunk's evidence images, moved into static/ by finalize()."""
+    return os.path.join(parts_dir(key), f"images_{index}")
+
+def load_state(key):
+    try:
+        with open(state_path(key)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_state(key, state):
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    tmp = state_path(key) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, state_path(key))
+
+def new_state(video, key, chunk_seconds):
+    fps, frame_count = video_info(video)
+    if frame_count <= 0:
+        raise ValueError("no frame count or duration")
+    return {
+        "video": os.path.abspath(video),
+        "session_id": f"{create_session_id()}_{key[:6]}",
+        "fps": fps,
+        "frame_count": frame_count,
+        "chunk_seconds": chunk_seconds,
+        "chunks": plan_chunks(frame_count, fps, chunk_seconds),
+        "done": {},
+        "completed": False
+    }
+
+# ===============================
+# WORKER PROCESS
+# models are loaded once per worker, not once per chunk
+# ===============================
+_worker = {}
+
+def init_worker(multi_face):
+    # one pool process per core; keep each model single-threaded
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", "1")
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+
+    import detectors
+    _worker["detect_emotion"] = detectors.make_emotion_detector(multi_face)
+    _worker["detect_phone"] = detectors.make_phone_detector(detectors.load_yolo())
+
+def analyze_chunk(key, session_id, video, index, start, end, fps, max_images):
+    detect_emotion = _worker["detect_emotion"]
+    detect_phone = _worker["detect_phone"]
+
+    # face IDs only make sense inside one chunk
+    if hasattr(detect_emotion, "tracker"):
+        detect_emotion.tracker = FaceTracker()
+
+    cap = cv2.VideoCapture(video)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    counts = init_emotion_counts()
+    frames = 0
+    faces = 0
+    events = []
+
+    emotion_every = max(int(round(fps * EMOTION_INTERVAL)), 1)
+    phone_every = max(int(round(fps * PHONE_INTERVAL)), 1)
+    # offline there is no CPU budget to respect, only motion gating
+    phone_scheduler = DetectionScheduler(
+        cpu_budget=0,
+        max_interval=MAX_DETECT_INTERVAL
+    )
+    # a retried chunk starts over, so a failed attempt's images never
+    # count against its budget
+    staging = staging_dir(key, index)
+    shutil.rmtree(staging, ignore_errors=True)
+    writer = EvidenceWriter(
+        staging,
+        max_images=max_images,
+        hash_distance=HASH_DISTANCE
+    )
+    last_phones = []
+
+    for n in range(start, end):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        t = n / fps
+
+        # EMOTION (every EMOTION_INTERVAL of video time)
+        if n % emotion_every == 0:
+            try:
+                results = as_face_results(detect_emotion(frame))
+            except Exception:
+                results = []
+
+            for _, mapped, _ in results:
+                counts[mapped] += 1
+                faces += 1
+                events.append((t, EMOTION_INDEX[mapped], -1))
+
+            for mapped in sorted({m for _, m, _ in results}):
+                writer.save(frame, mapped,
+                            [b for _, m, b in results if m == mapped and b])
+
+        # PHONE (every PHONE_INTERVAL of video time; motion gated, last
+        # result reused, so counts match live sessions per unit of time)
+        if n % phone_every:
+            continue
+
+        fresh = phone_scheduler.should_run(frame, t)
+        if fresh:
+            started = time.time()
+            try:
+                last_phones = detect_phone(frame)
+            except Exception:
+                last_phones = []
+            phone_scheduler.record(frame, started, time.time(), now=t)
+
+        if last_phones:
+            counts["using_phone"] += len(last_phones)
+            events.extend(
+                [(t, EMOTION_INDEX["using_phone"], -1)] * len(last_phones)
+            )
+            if fresh:
+                writer.save(frame, "using_phone", last_phones)
+
+    cap.release()
+
+    os.makedirs(parts_dir(key), exist_ok=True)
+    np.array(events, dtype=EVENT_DTYPE).tofile(
+        os.path.join(parts_dir(key), f"chunk_{index}.bin")
+    )
+
+    return {
+        "index": index,
+        "counts": counts,
+        "frames": frames,
+        "faces": faces,
+        "images": writer.stats(),
+        "phone_scheduler": phone_scheduler.stats()
+    }
+
+# ===============================
+# MERGE
+# ===============================
+def publish_images(key, session_id, chunks):
+    """Move the finished chunks' staged images into the session folder."""
+    for i in range(chunks):
+        staging = staging_dir(key, i)
+        for emotion in EMOTIONS:
+            src = os.path.join(staging, emotion)
+            if not os.path.isdir(src):
+                continue
+            dest = emotion_dir(session_id, emotion)
+            os.makedirs(dest, exist_ok=True)
+            for name in os.listdir(src):
+                shutil.move(os.path.join(src, name), os.path.join(dest, name))
+        shutil.rmtree(staging, ignore_errors=True)
+
+def dedupe_images(session_id, hash_distance=HASH_DISTANCE):
+    """
+    Chunks are deduplicated independently; drop near-duplicates across
+    chunk boundaries by the dHash of each image's thumbnail. Returns the
+    number of images removed.
+    """
+    removed = 0
+    for emotion in EMOTIONS:
+        folder = emotion_dir(session_id, emotion)
+        kept = []
+        for name in scan_emotion_dir(folder):
+            path = os.path.join(folder, name)
+            thumb = cv2.imread(thumbnail_path(path))
+            if thumb is None:
+                continue
+
+            h = dhash(thumb)
+            if not any(hamming(h, prev) <= hash_distance for prev in kept):
+                kept.append(h)
+                continue
+
+            stem = name[:-len(".jpg")]
+            for f in os.listdir(folder):
+                if f == name or f.startswith(stem + "_"):
+                    os.remove(os.path.join(folder, f))
+            removed += 1
+    return removed
+
+def finalize(key, state):
+    done = [state["done"][str(i)] for i in range(len(state["chunks"]))]
+    session_id = state["session_id"]
+
+    counts = init_emotion_counts()
+    for r in done:
+        for emo, n in r["counts"].items():
+            counts[emo] += n
+    total_frames = sum(r["frames"] for r in done)
+
+    # chunk timelines are already in time order; concatenate them
+    os.makedirs(TIMELINE_DIR, exist_ok=True)
+    with open(timeline_path(session_id), "wb") as out:
+        for i in range(len(done)):
+            part = os.path.join(parts_dir(key), f"chunk_{i}.bin")
+            if os.path.exists(part):
+                with open(part, "rb") as f:
+                    out.write(f.read())
+                os.remove(part)
+
+    publish_images(key, session_id, len(done))
+    if os.path.isdir(parts_dir(key)):
+        os.rmdir(parts_dir(key))
+
+    image_stats = {
+        k: sum(r["images"][k] for r in done)
+        for k in ("saved", "dropped_duplicate", "dropped_over_budget")
+    }
+    duplicates = dedupe_images(session_id)
+    image_stats["saved"] -= duplicates
+    image_stats["dropped_duplicate"] += duplicates
+    image_stats["max_images"] = MAX_IMAGES
+
+    save_session_summary(
+        session_id=session_id,
+        duration_minutes=round(total_frames / state["fps"] / 60, 2),
+        emotion_counts=counts,
+        total_faces_analyzed=sum(r["faces"] for r in done),
+        total_frames=total_frames,
+        image_stats=image_stats,
+        source={"type": "video", "path": state["video"],
+                "chunks": len(done), "fps": state["fps"]}
+    )
+
+    state["completed"] = True
+    save_state(key, state)
+    return session_id
+
+# ===============================
+# BATCH RUN
+# ===============================
+def run_batch(paths, workers=None, chunk_seconds=CHUNK_SECONDS, multi_face=True):
+    """
+    Analyze recorded videos in a process pool and save one session per
+    video. Finished chunks are checkpointed, so an interrupted run picks
+    up where it stopped when started again with the same files.
+    """
+    jobs = {}
+    pending = []
+
+    for video in find_videos(paths):
+        key = job_key(video)
+        state = load_state(key)
+        if state and state["completed"]:
+            print("Already analyzed:", video, "->", state["session_id"])
+            continue
+        if state is None or state.get("chunk_seconds") != chunk_seconds:
+            try:
+                state = new_state(video, key, chunk_seconds)
+            except ValueError as e:
+                # not marked done, so a later run tries again
+                print("Skipping unreadable video:", video, e)
+                continue
+            save_state(key, state)
+
+        jobs[key] = state
+        images_per_chunk = max(MAX_IMAGES // len(state["chunks"]), 1)
+        for i, (start, end) in enumerate(state["chunks"]):
+            if str(i) not in state["done"]:
+                pending.append((key, state["session_id"], state["video"],
+                                i, start, end, state["fps"], images_per_chunk))
+
+    for key, state in list(jobs.items()):
+        if len(state["done"]) == len(state["chunks"]):
+            print("Saved:", finalize(key, state))
+            del jobs[key]
+
+    if not pending:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Analyzing {len(pending)} chunks from {len(jobs)} videos "
+          f"on {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(multi_face,)) as pool:
+        futures = {pool.submit(analyze_chunk, *job): job[0] for job in pending}
+
+        for future in as_completed(futures):
+            key = futures[future]
+            state = jobs[key]
+            try:
+                result = future.result()
+            except Exception as e:
+                # left pending; the next run retries this chunk
+                print("Chunk failed:", state["video"], e)
+                continue
+
+            state["done"][str(result["index"])] = result
+            save_state(key, state)
+
+            if len(state["done"]) == len(state["chunks"]):
+                print("Saved:", finalize(key, state))
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime, timedelta
+import cv2
+import numpy as np
+from profiling import Profiler
+
+BENCH_DIR = os.path.abspath(os.path.join("data", "bench"))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+VIDEO_PATH = os.path.join(BENCH_DIR, "synthetic.avi")
+
+EMOTIONS = ["focused", "laughing", "bored", "sad", "using_phone"]
+
+# fewer detections than this and a stage's p50/p95 say nothing
+MIN_STAGE_SAMPLES = 30
+
+# ===============================
+# SYNTHETIC LECTURE VIDEO
+# generated once from a fixed seed, so every run replays the same frames
+# ===============================
+def draw_face(frame, cx, cy, r):
+    cv2.ellipse(frame, (cx, cy), (r, int(r * 1.25)), 0, 0, 360,
+                (140, 170, 210), -1)
+    for dx in (-r // 3, r // 3):
+        cv2.circle(frame, (cx + dx, cy - r // 4), max(r // 8, 2), (40, 40, 40), -1)
+    cv2.ellipse(frame, (cx, cy + r // 2), (r // 3, r // 8), 0, 0, 180,
+                (60, 60, 120), 2)
+
+def make_synthetic_video(path=VIDEO_PATH, seconds=60, fps=15, size=(640, 480),
+                         faces=6, seed=7):
+    """
+    A classroom-like clip: a few drifting faces, a phone that comes and
+    goes, and a still stretch in the middle where motion gating should
+    skip detections.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = np.random.RandomState(seed)
+    w, h = size
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    base = rng.randint(0, 40, (h, w, 3)).astype(np.uint8) + 60
+    pos = rng.uniform([60, 80], [w - 60, h - 80], (faces, 2))
+    vel = rng.uniform(-3, 3, (faces, 2))
+
+    total = seconds * fps
+    still = range(int(total * 0.4), int(total * 0.6))
+    for n in range(total):
+        if n not in still:
+            pos += vel
+            # bounce off the edges, so the moving stretches stay above
+            # the scheduler's motion threshold
+            vel[(pos < [40, 60]) | (pos > [w - 40, h - 60])] *= -1
+            pos = np.clip(pos, [40, 60], [w - 40, h - 60])
+
+        frame = base.copy()
+        for cx, cy in pos.astype(int):
+            draw_face(frame, cx, cy, 32)
+        if (n // fps) % 10 < 4:
+            cv2.rectangle(frame, (w // 2 - 20, h - 120), (w // 2 + 20, h - 40),
+                          (20, 20, 20), -1)
+        writer.write(frame)
+
+    writer.release()
+    return path
+
+# ===============================
+# STAND-IN MODELS
+# fixed-cost replacements that isolate the pipeline's own overhead
+# ===============================
+def fake_detectors(emotion_ms=60, phone_ms=40):
+    def detect_emotion(frame):
+        time.sleep(emotion_ms / 1000)
+        return [(i, EMOTIONS[i % 4], (10 + 60 * i, 10, 50, 60)) for i in range(3)]
+
+    def detect_phone(frame):
+        time.sleep(phone_ms / 1000)
+        return [(300, 360, 40, 80)] if frame[400, 320].sum() < 100 else []
+
+    return detect_emotion, detect_phone
+
+# ===============================
+# PIPELINE REPLAY
+# ===============================
+def bench_pipeline(video, models="fake", realtime=True):
+    """
+    Replay a video through SessionPipeline and return its profile.
+    `realtime` paces capture on the video's own clock, so the detectors
+    sample it the way they would a live camera; without it the video is
+    decoded as fast as possible and the run ends before most samples.
+    """
+    from emotion_utils import init_emotion_counts
+    from pipeline import SessionPipeline
+    from scheduler import DetectionScheduler
+    from image_writer import EvidenceWriter
+    import run_session
+
+    if models == "fake":
+        detect_emotion, detect_phone = fake_detectors()
+    else:
+        detect_emotion, detect_phone = run_session.load_detectors(
+            use_service=(models == "service"))
+
+    # evidence images go to a scratch folder, not static/emotions
+    work = os.path.join(BENCH_DIR, "pipeline_images")
+    shutil.rmtree(work, ignore_errors=True)
+
+    profiler = Profiler()
+    writer = EvidenceWriter(work, max_images=run_session.MAX_IMAGES,
+                            profiler=profiler)
+    cap = cv2.VideoCapture(video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 15
+
+    pipeline = SessionPipeline(
+        cap,
+        detect_emotion=detect_emotion,
+        detect_phone=detect_phone,
+        save_image=writer.save,
+        emotion_counts=init_emotion_counts(),
+        emotion_scheduler=DetectionScheduler(
+            cpu_budget=run_session.EMOTION_CPU_BUDGET,
+            max_interval=run_session.MAX_DETECT_INTERVAL,
+            motion_threshold=run_session.MOTION_THRESHOLD
+        ),
+        phone_scheduler=DetectionScheduler(
+            cpu_budget=run_session.PHONE_CPU_BUDGET,
+            max_interval=run_session.MAX_DETECT_INTERVAL,
+            motion_threshold=run_session.MOTION_THRESHOLD
+        ),
+        frame_interval=1 / fps if realtime else 0,
+        profiler=profiler
+    )
+
+    started = time.time()
+    pipeline.start()
+    pipeline.capture_done.wait()
+    pipeline.stop()
+    cap.release()
+    wall = time.time() - started
+
+    stats = pipeline.stats()
+    stages = stats["profile"]["stages"]
+    few_samples = {
+        name: stages.get(name, {}).get("count", 0) for name in ("emotion", "phone")
+        if stages.get(name, {}).get("count", 0) < MIN_STAGE_SAMPLES
+    }
+    return {
+        "video": video,
+        "models": models,
+        "realtime": realtime,
+        "wall_seconds": round(wall, 2),
+        "frames": pipeline.total_frames,
+        "throughput_fps": round(pipeline.total_frames / wall, 2) if wall else None,
+        "images": writer.stats(),
+        "profile": stats["profile"],
+        "schedulers": stats["schedulers"],
+        "few_samples": few_samples
+    }
+
+# ===============================
+# SESSION CORPUS
+# ===============================
+def make_corpus(directory, count, seed=11):
+    """Write `count` session JSONs shaped like save_session_summary()'s."""
+    sessions = os.path.join(directory, "data", "sessions")
+    os.makedirs(sessions, exist_ok=True)
+    rng = np.random.RandomState(seed)
+    start = datetime(2025, 1, 6, 8, 0)
+
+    for i in range(count):
+        session_id = f"bench_{i:06d}"
+        counts = {emo: int(n) for emo, n in
+                  zip(EMOTIONS, rng.randint(0, 400, len(EMOTIONS)))}
+        frames = int(rng.randint(5000, 60000))
+        data = {
+            "session_id": session_id,
+            "duration_minutes": int(rng.choice([30, 45, 60, 90])),
+            "emotion_counts": counts,
+            "total_faces_analyzed": sum(counts.values()) - counts["using_phone"],
+            "total_frames": frames,
+            "total_emotion_samples": sum(counts.values()),
+            "saved_at": (start + timedelta(hours=3 * i)).isoformat(),
+            "pipeline": {"profile": {
+                "stages": {"emotion": {"p95_ms": float(rng.uniform(50, 400))}},
+                "rates": {"capture": {"mean_fps": float(rng.uniform(10, 30))}}
+            }}
+        }
+        with open(os.path.join(sessions, f"session_{session_id}.json"), "w") as f:
+            json.dump(data, f)
+
+def corpus_dir(count):
+    return os.path.join(BENCH_DIR, f"corpus_{count}")
+
+# ===============================
+# DASHBOARD ROUTES
+# ===============================
+def bench_routes(count=5000, repeat=20):
+    """
+    Time the Flask views against a generated corpus. "cold" runs clear
+    the in-process cache first; "warm" runs hit it.
+    """
+    directory = corpus_dir(count)
+    if not os.path.isdir(directory):
+        print(f"Generating {count} sessions in {directory}")
+        make_corpus(directory, count)
+
+    # every data path in the app is relative to the working directory
+    os.chdir(directory)
+    from app import app
+    from emotion_utils import clear_cache, ensure_store
+
+    profiler = Profiler()
+    with profiler.stage("import_store"):
+        ensure_store()
+
+    client = app.test_client()
+    sid = f"bench_{count // 2:06d}"
+    pages = max(count // 50, 1)
+    routes = {
+        "home": lambda: client.get("/"),
+        "home_last_page": lambda: client.get(f"/?page={pages}"),
+        "analytics": lambda: client.get("/analytics"),
+        "dashboard": lambda: client.get(f"/session/{sid}"),
+        "timeline": lambda: client.get(f"/session/{sid}/timeline"),
+        "compare": lambda: client.post("/compare", data={
+            "current_session": sid, "compare_session": "bench_000000"}),
+        "metrics": lambda: client.get("/metrics")
+    }
+
+    for name, call in routes.items():
+        for _ in range(repeat):
+            clear_cache()
+            with profiler.stage(f"{name}.cold"):
+                status = call().status_code
+            with profiler.stage(f"{name}.warm"):
+                call()
+        if status != 200:
+            print(f"  {name}: HTTP {status}")
+
+    return {
+        "sessions": count,
+        "repeat": repeat,
+        "profile": profiler.summary()
+    }
+
+# ===============================
+# REPORTING
+# ===============================
+def print_profile(profile, baseline=None):
+    base_stages = (baseline or {}).get("profile", {}).get("stages", {})
+    print(f"  {'stage':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, s in profile["stages"].items():
+        line = (f"  {name:<24}{s['count']:>7}{s['p50_ms']:>10}"
+                f"{s['p95_ms']:>10}{s['max_ms']:>10}")
+        before = base_stages.get(name, {}).get("p95_ms")
+        if before:
+            line += f"   p95 {100 * (s['p95_ms'] - before) / before:+.0f}%"
+        print(line)
+
+    for name, r in profile.get("rates", {}).items():
+        print(f"  {name} fps: mean {r['mean_fps']}, p50 {r['p50_fps']}, "
+              f"p5 {r['p5_fps']}")
+    if "missed_samples" in profile:
+        print("  missed samples:", profile["missed_samples"],
+              "dropped evidence:", profile["dropped_evidence"])
+
+def save_result(kind, result):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR,
+                        f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+def load_baseline(path):
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+# ===============================
+# ENTRY POINT
+# ===============================
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a synthetic lecture and a generated session "
+                    "corpus to measure the pipeline and dashboard offline."
+    )
+    parser.add_argument("suite", choices=["pipeline", "routes", "all"])
+    parser.add_argument("--video", help="video to replay (default: synthetic)")
+    parser.add_argument("--seconds", type=int, default=60,
+                        help="length of the generated synthetic video")
+    parser.add_argument("--models", choices=["fake", "local", "service"],
+                        default="fake",
+                        help="fixed-cost stand-ins, in-process models, or "
+                             "the running inference service")
+    parser.add_argument("--unpaced", dest="realtime", action="store_false",
+                        help="decode the video as fast as possible instead of "
+                             "at its frame rate (too few detections for "
+                             "stage percentiles)")
+    parser.add_argument("--sessions", type=int, default=5000,
+                        help="size of the generated session corpus")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--baseline", help="earlier result JSON to compare with")
+    args = parser.parse_args()
+    baseline = load_baseline(args.baseline)
+
+    if args.suite in ("pipeline", "all"):
+        video = args.video
+        if video is None:
+            video = VIDEO_PATH
+            if not os.path.exists(video):
+                print("Generating", video)
+                make_synthetic_video(video, seconds=args.seconds)
+
+        result = bench_pipeline(os.path.abspath(video), args.models, args.realtime)
+        print(f"Pipeline: {result['frames']} frames in {result['wall_seconds']}s "
+              f"({result['throughput_fps']} fps)")
+        print_profile(result["profile"], baseline)
+        for name, count in result["few_samples"].items():
+            print(f"  warning: {name} ran {count} times (< {MIN_STAGE_SAMPLES}); "
+                  f"its percentiles are not comparable, replay a longer video")
+        print("Saved", save_result("pipeline", result))
+
+    if args.suite in ("routes", "all"):
+        result = bench_routes(args.sessions, args.repeat)
+        print(f"Routes over {result['sessions']} sessions:")
+        print_profile(result["profile"], baseline)
+        print("Saved", save_result("routes", result))
+
+
+if __name__ == "__main__":
+    main()
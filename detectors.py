@@ -0,0 +1,62 @@
+from emotion_utils import map_emotion
+from face_tracker import MultiFaceAnalyzer
+
+# TensorFlow/DeepFace and ultralytics/torch take seconds to import, so
+# they are imported on first use instead of when this module loads
+
+YOLO_WEIGHTS = "yolov8n.pt"
+PHONE_LABELS = ["cell phone", "phone"]
+
+# ===============================
+# EMOTION
+# ===============================
+def detect_emotion(frame):
+    """Single-face path: DeepFace on the whole frame, first face only."""
+    from deepface import DeepFace
+
+    results = DeepFace.analyze(
+        frame,
+        actions=["emotion"],
+        enforce_detection=False
+    )
+    region = results[0].get("region") or {}
+    box = tuple(region.get(k, 0) for k in ("x", "y", "w", "h"))
+    return [(None, map_emotion(results[0]["dominant_emotion"]),
+             box if box[2] and box[3] else None)]
+
+def make_emotion_detector(multi_face=True):
+    # track every face in the room with a stable ID and classify them in
+    # one batch, instead of counting only the first face DeepFace returns
+    return MultiFaceAnalyzer() if multi_face else detect_emotion
+
+# ===============================
+# PHONE (YOLO)
+# ===============================
+def load_yolo(weights=YOLO_WEIGHTS):
+    from ultralytics import YOLO
+    return YOLO(weights)
+
+def phone_boxes(yolo, result):
+    phones = []
+    for box in result.boxes:
+        cls = int(box.cls[0])
+        label = yolo.names[cls]
+
+        if label in PHONE_LABELS:
+            x1, y1, x2, y2 = (int(v) for v in box.xyxy[0])
+            phones.append((x1, y1, x2 - x1, y2 - y1))
+    return phones
+
+def make_phone_detector(yolo):
+    def detect_phone(frame):
+        phones = []
+        for r in yolo(frame, verbose=False):
+            phones.extend(phone_boxes(yolo, r))
+        return phones
+    return detect_phone
+
+def make_batch_phone_detector(yolo):
+    """One YOLO call for a list of frames; returns boxes per frame."""
+    def detect_phones(frames):
+        return [phone_boxes(yolo, r) for r in yolo(list(frames), verbose=False)]
+    return detect_phones
@@ -1,6 +1,12 @@
 import os
 import json
-from datetime import datetime
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+import session_store
+import image_pack
 
 SESSION_DIR = "data/sessions"
 
@@ -18,8 +24,20 @@ def init_emotion_counts():
         "using_phone": 0
     }
 
+def map_emotion(dominant):
+    if dominant in ["happy", "surprise"]:
+        return "laughing"
+    elif dominant == "neutral":
+        return "focused"
+    elif dominant in ["angry", "disgust", "fear"]:
+        return "bored"
+    else:
+        return "sad"
+
 def save_session_summary(session_id, duration_minutes, emotion_counts,
-                         total_faces_analyzed, total_frames):
+                         total_faces_analyzed, total_frames,
+                         pipeline_stats=None, face_counts=None,
+                         image_stats=None, source=None):
 
     data = {
         "session_id": session_id,
@@ -31,40 +49,279 @@ def save_session_summary(session_id, duration_minutes, emotion_counts,
         "saved_at": datetime.now().isoformat()
     }
 
+    if source is not None:
+        data["source"] = source
+
+    if pipeline_stats is not None:
+        data["pipeline"] = pipeline_stats
+
+    if image_stats is not None:
+        data["images"] = image_stats
+
+    if face_counts:
+        data["face_counts"] = face_counts
+
+    # the JSON file stays as a portable export; the store is what we query
     path = os.path.join(SESSION_DIR, f"session_{session_id}.json")
     with open(path, "w") as f:
         json.dump(data, f, indent=2)
 
-def load_all_sessions():
-    sessions = []
-    for file in os.listdir(SESSION_DIR):
-        if file.endswith(".json"):
-            with open(os.path.join(SESSION_DIR, file)) as f:
-                sessions.append(json.load(f))
-    return sessions
+    session_store.save(data, file_mtime=os.stat(path).st_mtime_ns)
+
+# ===============================
+# SESSION METRICS
+# ===============================
+def grade_for(engagement):
+    if engagement >= 80:
+        return "A (Excellent)"
+    elif engagement >= 65:
+        return "B (Good)"
+    elif engagement >= 50:
+        return "C (Average)"
+    else:
+        return "D (Poor)"
+
+def compute_metrics(session):
+    counts = session["emotion_counts"]
+
+    focused = counts.get("focused", 0)
+    laughing = counts.get("laughing", 0)
+    bored = counts.get("bored", 0)
+    sad = counts.get("sad", 0)
+    phone = counts.get("using_phone", 0)
+
+    total = max(focused + laughing + bored + sad + phone, 1)
+    engaged_ratio = (focused + laughing) / total
+    phone_ratio = phone / total
+    engagement = round(engaged_ratio * 100, 2)
+
+    return {
+        "engaged_ratio": engaged_ratio,
+        "phone_ratio": phone_ratio,
+        "engagement": engagement,
+        "phone_percent": round(phone_ratio * 100, 2),
+        "grade": grade_for(engagement)
+    }
+
+# ===============================
+# SESSION STORE (SQLite, indexed)
+# ===============================
+# the JSON files are stat'ed at most once per STORE_CHECK_INTERVAL
+STORE_CHECK_INTERVAL = 1.0
+
+_json_state = {"checked": 0.0, "version": None, "synced": None}
+_json_lock = threading.Lock()
+
+def json_version():
+    """
+    (newest mtime, file count, checksum of every name and mtime) of the
+    session JSONs, so added, deleted and edited-in-place files all
+    change it.
+    """
+    with _json_lock:
+        now = time.monotonic()
+        if (_json_state["version"] is not None
+                and now - _json_state["checked"] < STORE_CHECK_INTERVAL):
+            return _json_state["version"]
+
+        newest, count, crc = 0, 0, 0
+        for e in sorted(os.scandir(SESSION_DIR), key=lambda e: e.name):
+            if not (e.name.startswith("session_") and e.name.endswith(".json")):
+                continue
+            try:
+                mtime = e.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            newest = max(newest, mtime)
+            count += 1
+            crc = zlib.crc32(f"{e.name}:{mtime};".encode(), crc)
+
+        _json_state["checked"] = now
+        _json_state["version"] = (newest, count, crc)
+        return _json_state["version"]
+
+def ensure_store():
+    """Sync the store with the JSON files when any was added, edited or deleted."""
+    version = json_version()
+    if version != _json_state["synced"]:
+        session_store.import_json_sessions(SESSION_DIR)
+        _json_state["synced"] = version
+
+# ===============================
+# PROCESS-LOCAL CACHE
+# parsed sessions, listings and metrics, dropped whenever the store file
+# or any session JSON changes; LRU-bounded
+# ===============================
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def data_version():
+    try:
+        db_mtime = os.stat(session_store.DB_PATH).st_mtime_ns
+    except FileNotFoundError:
+        db_mtime = 0
+    return (db_mtime,) + json_version()
+
+def data_last_modified():
+    """UTC datetime of the latest change to the session data."""
+    db_mtime, newest = data_version()[:2]
+    return datetime.fromtimestamp(max(db_mtime, newest) // 10**9, timezone.utc)
+
+def data_etag():
+    return "sessions-" + "-".join(str(v) for v in data_version())
+
+def cached(key, loader, version=None):
+    """Return the cached value for key, reloading when version changes."""
+    if version is None:
+        ensure_store()
+        version = data_version()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and entry[0] == version:
+            _cache.move_to_end(key)
+            return entry[1]
+
+    value = loader()
+
+    with _cache_lock:
+        _cache[key] = (version, value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+# ===============================
+# SESSION QUERIES
+# ===============================
+def load_all_sessions(newest_first=False):
+    return cached(
+        ("all", newest_first),
+        lambda: session_store.list_sessions(newest_first=newest_first)
+    )
+
+def list_sessions(page=1, per_page=50):
+    page = max(page, 1)
+    return cached(
+        ("page", page, per_page),
+        lambda: session_store.list_sessions(
+            limit=per_page,
+            offset=(page - 1) * per_page
+        )
+    )
+
+def list_session_ids():
+    return cached(("ids",), session_store.list_session_ids)
+
+def count_sessions():
+    return cached(("count",), session_store.count_sessions)
 
 def load_session(session_id):
-    path = os.path.join(SESSION_DIR, f"session_{session_id}.json")
-    if not os.path.exists(path):
-        return None
-    with open(path) as f:
-        return json.load(f)
+    return cached(("session", session_id),
+                  lambda: session_store.get(session_id))
+
+def load_session_metrics(session_id):
+    def load():
+        session = session_store.get(session_id)
+        return compute_metrics(session) if session else None
+    return cached(("metrics", session_id), load)
+
+def load_all_metrics():
+    """[(session_id, metrics)] for every session, oldest first."""
+    return cached(
+        ("all_metrics",),
+        lambda: [(s["session_id"], compute_metrics(s))
+                 for s in load_all_sessions()]
+    )
 
 # ===============================
 # NEW FEATURE: LOAD EMOTION IMAGES
 # ===============================
-def load_emotion_images(session_id):
-    base = os.path.join("static", "emotions", session_id)
-    images = {}
-
-    for emo in ["focused", "laughing", "bored", "sad", "using_phone"]:
-        emo_dir = os.path.join(base, emo)
-        if os.path.exists(emo_dir):
-            images[emo] = [
-                f"/static/emotions/{session_id}/{emo}/{img}"
-                for img in os.listdir(emo_dir)
-            ]
-        else:
-            images[emo] = []
-
-    return images
+# timelines store an index into this list: only ever append to it
+EMOTIONS = ["focused", "laughing", "bored", "sad", "using_phone"]
+IMAGE_ROOT = os.path.join("static", "emotions")
+# finished sessions are packed here by retention.py
+ARCHIVE_DIR = os.path.join("data", "archive")
+
+def emotion_dir(session_id, emotion):
+    return os.path.join(IMAGE_ROOT, session_id, emotion)
+
+def archive_path(session_id):
+    return os.path.join(ARCHIVE_DIR, f"{session_id}.pack")
+
+def images_version(session_id):
+    version = []
+    for path in [emotion_dir(session_id, emo) for emo in EMOTIONS] + \
+                [archive_path(session_id)]:
+        try:
+            version.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            version.append(0)
+    return tuple(version)
+
+def scan_emotion_dir(path):
+    if not os.path.isdir(path):
+        return []
+
+    # <uuid>_thumb.jpg / <uuid>_crop<N>.jpg sit next to each image
+    entries = [
+        e for e in os.scandir(path)
+        if e.is_file() and e.name.endswith(".jpg") and "_" not in e.name
+    ]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    return [e.name for e in entries]
+
+def load_archive(session_id):
+    """
+    (index, {(emotion, name): entry}) of the session's pack, or None.
+    Cached until the pack is rewritten.
+    """
+    def load():
+        index = image_pack.read_index(archive_path(session_id))
+        if index is None:
+            return None
+        lookup = {(emo, e["name"]): e
+                  for emo, entries in index["images"].items() for e in entries}
+        return index, lookup
+
+    return cached(("archive", session_id), load,
+                  version=images_version(session_id))
+
+def is_archived(session_id):
+    """True when the session's images are served from its pack."""
+    if os.path.isdir(os.path.join(IMAGE_ROOT, session_id)):
+        return False
+    return load_archive(session_id) is not None
+
+def load_emotion_manifest(session_id):
+    """{emotion: [file names in capture order]}, cached until a folder changes."""
+    def load():
+        if is_archived(session_id):
+            index, _ = load_archive(session_id)
+            return {emo: [e["name"] for e in index["images"].get(emo, [])]
+                    for emo in EMOTIONS}
+        return {emo: scan_emotion_dir(emotion_dir(session_id, emo))
+                for emo in EMOTIONS}
+
+    return cached(("manifest", session_id), load,
+                  version=images_version(session_id))
+
+def load_emotion_page(session_id, emotion, page=1, per_page=24):
+    names = load_emotion_manifest(session_id).get(emotion, [])
+    pages = max((len(names) + per_page - 1) // per_page, 1)
+    page = min(max(page, 1), pages)
+    start = (page - 1) * per_page
+
+    return {
+        "emotion": emotion,
+        "page": page,
+        "pages": pages,
+        "total": len(names),
+        "images": names[start:start + per_page]
+    }
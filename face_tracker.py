@@ -0,0 +1,219 @@
+import cv2
+import numpy as np
+from emotion_utils import map_emotion
+
+# order of the DeepFace emotion model outputs
+DEEPFACE_EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+THUMB_SIZE = (16, 16)
+
+# ===============================
+# FACE DETECTION
+# ===============================
+def load_face_detector():
+    return cv2.CascadeClassifier(
+        cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+    )
+
+def detect_faces(detector, frame, min_size=40):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = detector.detectMultiScale(
+        gray,
+        scaleFactor=1.1,
+        minNeighbors=5,
+        minSize=(min_size, min_size)
+    )
+    return [tuple(int(v) for v in f) for f in faces]
+
+def crop_face(frame, box):
+    x, y, w, h = box
+    return frame[max(y, 0):y + h, max(x, 0):x + w]
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+def appearance_thumb(crop):
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+# ===============================
+# TRACKING (STABLE FACE IDS)
+# ===============================
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.missed = 0
+        self.emotion = None
+        self.thumb = None      # appearance at last classification
+
+
+class FaceTracker:
+    """Greedy IoU matching of detections to tracks across ticks."""
+
+    def __init__(self, iou_threshold=0.3, max_missed=3, change_threshold=12.0):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.change_threshold = change_threshold
+        self.tracks = {}
+        self.next_id = 1
+
+    def update(self, boxes):
+        pairs = sorted(
+            ((iou(t.box, b), tid, i)
+             for tid, t in self.tracks.items()
+             for i, b in enumerate(boxes)),
+            reverse=True
+        )
+
+        matched_tracks = set()
+        matched_boxes = {}
+        for score, tid, i in pairs:
+            if score < self.iou_threshold:
+                break
+            if tid in matched_tracks or i in matched_boxes:
+                continue
+            matched_tracks.add(tid)
+            matched_boxes[i] = tid
+
+        for tid, t in list(self.tracks.items()):
+            if tid not in matched_tracks:
+                t.missed += 1
+                if t.missed > self.max_missed:
+                    del self.tracks[tid]
+
+        visible = []
+        for i, box in enumerate(boxes):
+            tid = matched_boxes.get(i)
+            if tid is None:
+                tid = self.next_id
+                self.next_id += 1
+                self.tracks[tid] = Track(tid, box)
+
+            t = self.tracks[tid]
+            t.box = box
+            t.missed = 0
+            visible.append(t)
+
+        return visible
+
+    def needs_classification(self, track, thumb):
+        if track.emotion is None or track.thumb is None:
+            return True
+        diff = cv2.absdiff(track.thumb, thumb).mean()
+        return diff > self.change_threshold
+
+
+# ===============================
+# BATCHED EMOTION CLASSIFICATION
+# ===============================
+def load_emotion_model():
+    from deepface import DeepFace
+
+    try:
+        client = DeepFace.build_model("Emotion", task="facial_attribute")
+    except TypeError:
+        client = DeepFace.build_model("Emotion")
+
+    # newer DeepFace wraps the keras model in a client object
+    return getattr(client, "model", client)
+
+def classify_batch(model, crops):
+    batch = np.stack([
+        cv2.resize(cv2.cvtColor(c, cv2.COLOR_BGR2GRAY), (48, 48))
+        for c in crops
+    ]).astype("float32") / 255.0
+    batch = np.expand_dims(batch, axis=-1)
+
+    probs = model.predict(batch, verbose=0)
+    return [DEEPFACE_EMOTIONS[int(np.argmax(p))] for p in probs]
+
+
+class MultiFaceAnalyzer:
+    """
+    Detects every face in a frame, keeps stable IDs across ticks and
+    classifies new or visibly changed faces in one batched forward pass.
+    Returns a list of (face_id, mapped_emotion, box).
+    """
+
+    def __init__(self, tracker=None, detector=None, model=None):
+        self.tracker = tracker or FaceTracker()
+        self.detector = detector or load_face_detector()
+        self.model = model
+
+        self.faces_seen = 0
+        self.faces_classified = 0
+        self.batches = 0
+
+    def __call__(self, frame):
+        return analyze_batch([(self, frame)], self.model_or_load())[0]
+
+    def model_or_load(self):
+        if self.model is None:
+            self.model = load_emotion_model()
+        return self.model
+
+    def prepare(self, frame):
+        """Detect and track faces; pick the crops that need the model."""
+        boxes = detect_faces(self.detector, frame)
+        tracks = self.tracker.update(boxes)
+
+        stale, crops, thumbs = [], [], []
+        for t in tracks:
+            crop = crop_face(frame, t.box)
+            if crop.size == 0:
+                continue
+            thumb = appearance_thumb(crop)
+            if self.tracker.needs_classification(t, thumb):
+                stale.append(t)
+                crops.append(crop)
+                thumbs.append(thumb)
+
+        return tracks, stale, crops, thumbs
+
+    def finish(self, tracks, stale, thumbs, dominants):
+        for t, thumb, dominant in zip(stale, thumbs, dominants):
+            t.emotion = map_emotion(dominant)
+            t.thumb = thumb
+
+        if stale:
+            self.batches += 1
+            self.faces_classified += len(stale)
+
+        self.faces_seen += len(tracks)
+        return [(t.id, t.emotion, t.box)
+                for t in tracks if t.emotion is not None]
+
+    def stats(self):
+        return {
+            "faces_seen": self.faces_seen,
+            "faces_classified": self.faces_classified,
+            "batches": self.batches,
+            "active_tracks": len(self.tracker.tracks),
+            "total_tracks": self.tracker.next_id - 1
+        }
+
+
+def analyze_batch(items, model):
+    """
+    Run several (analyzer, frame) pairs, possibly from different cameras,
+    through one batched forward pass of a shared emotion model.
+    """
+    prepared = [analyzer.prepare(frame) for analyzer, frame in items]
+    crops = [c for _, _, frame_crops, _ in prepared for c in frame_crops]
+    dominants = classify_batch(model, crops) if crops else []
+
+    results = []
+    i = 0
+    for (analyzer, _), (tracks, stale, _, thumbs) in zip(items, prepared):
+        results.append(analyzer.finish(tracks, stale, thumbs,
+                                       dominants[i:i + len(stale)]))
+        i += len(stale)
+    return results
@@ -0,0 +1,64 @@
+import os
+import json
+import struct
+import uuid
+
+# ===============================
+# SESSION IMAGE ARCHIVE
+# one file per session:
+#   [image bytes ...][index JSON][index offset: u64][MAGIC]
+# the index maps emotion -> [{name, full, thumb}] where every
+# image is an [offset, size] pair, so a single image is one ranged read
+# ===============================
+MAGIC = b"ELPACK01"
+FOOTER = struct.Struct("<Q8s")
+
+class PackWriter:
+    """Appends images to a temp file; close() adds the index and renames."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        self.file = open(self.tmp, "wb")
+        self.offset = 0
+
+    def add(self, data):
+        self.file.write(data)
+        span = [self.offset, len(data)]
+        self.offset += len(data)
+        return span
+
+    def close(self, index):
+        body = json.dumps(index).encode()
+        self.file.write(body)
+        self.file.write(FOOTER.pack(self.offset, MAGIC))
+        self.file.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp)
+
+def read_index(path):
+    """The pack's index, or None when the file is missing or not a pack."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size < FOOTER.size:
+                return None
+            f.seek(size - FOOTER.size)
+            offset, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC or offset > size - FOOTER.size:
+                return None
+            f.seek(offset)
+            return json.loads(f.read(size - FOOTER.size - offset))
+    except (FileNotFoundError, ValueError):
+        return None
+
+def read_blob(path, span):
+    offset, size = span
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
@@ -0,0 +1,123 @@
+import os
+import time
+import uuid
+from collections import deque
+import cv2
+
+THUMB_WIDTH = 160
+
+# ===============================
+# PERCEPTUAL HASH (dHash)
+# ===============================
+def dhash(frame, size=8):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+
+    value = 0
+    for b in bits:
+        value = (value << 1) | int(b)
+    return value
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def make_thumbnail(frame, width=THUMB_WIDTH):
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, int(h * width / w)),
+                      interpolation=cv2.INTER_AREA)
+
+
+def thumbnail_path(image_path):
+    root, ext = os.path.splitext(image_path)
+    return f"{root}_thumb{ext}"
+
+def ensure_thumbnail(image_path, width=THUMB_WIDTH):
+    """Create <name>_thumb.jpg for an existing image if missing."""
+    path = thumbnail_path(image_path)
+    if not os.path.exists(path):
+        frame = cv2.imread(image_path)
+        if frame is None:
+            return None
+        # write then rename so concurrent requests never see half a file
+        tmp = f"{path}.{uuid.uuid4().hex}.jpg"
+        cv2.imwrite(tmp, make_thumbnail(frame, width),
+                    [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+        os.replace(tmp, path)
+    return path
+
+
+# ===============================
+# EVIDENCE IMAGE WRITER
+# ===============================
+class EvidenceWriter:
+    """
+    Writes evidence images for one session.
+
+    Each kept image is stored as <uuid>.jpg with a <uuid>_thumb.jpg next
+    to it and one <uuid>_crop<N>.jpg per face/phone box. Frames whose
+    dHash is within hash_distance bits of a recent image in the same
+    emotion bucket are skipped, and at most max_images are kept.
+    """
+
+    def __init__(self, base_dir, max_images=300, hash_distance=6,
+                 history=64, jpeg_quality=85, profiler=None):
+        self.base_dir = base_dir
+        self.max_images = max_images
+        self.hash_distance = hash_distance
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        self.profiler = profiler
+
+        self.recent = {}
+        self.history = history
+
+        self.saved = 0
+        self.duplicates = 0
+        self.over_budget = 0
+
+    def is_duplicate(self, emotion, h):
+        bucket = self.recent.setdefault(emotion, deque(maxlen=self.history))
+        if any(hamming(h, prev) <= self.hash_distance for prev in bucket):
+            return True
+        bucket.append(h)
+        return False
+
+    def save(self, frame, emotion, boxes=None):
+        if self.saved >= self.max_images:
+            self.over_budget += 1
+            return False
+
+        if self.is_duplicate(emotion, dhash(frame)):
+            self.duplicates += 1
+            return False
+
+        emo_dir = os.path.join(self.base_dir, emotion)
+        os.makedirs(emo_dir, exist_ok=True)
+        name = uuid.uuid4().hex
+
+        started = time.perf_counter()
+        cv2.imwrite(os.path.join(emo_dir, f"{name}.jpg"), frame, self.params)
+        cv2.imwrite(thumbnail_path(os.path.join(emo_dir, f"{name}.jpg")),
+                    make_thumbnail(frame), self.params)
+
+        for i, (x, y, w, h) in enumerate(boxes or []):
+            crop = frame[max(y, 0):y + h, max(x, 0):x + w]
+            if crop.size:
+                cv2.imwrite(os.path.join(emo_dir, f"{name}_crop{i}.jpg"),
+                            crop, self.params)
+
+        if self.profiler is not None:
+            self.profiler.record("imwrite", time.perf_counter() - started)
+
+        self.saved += 1
+        return True
+
+    def stats(self):
+        return {
+            "saved": self.saved,
+            "dropped_duplicate": self.duplicates,
+            "dropped_over_budget": self.over_budget,
+            "max_images": self.max_images
+        }
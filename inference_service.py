@@ -0,0 +1,330 @@
+import os
+import time
+import secrets
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from pipeline import BatchingDetector
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = int(os.environ.get("INFERENCE_PORT", 6010))
+
+# ===============================
+# AUTH KEY
+# multiprocessing.connection pickles every message, so only processes
+# that can read this per-install key (mode 0600) may talk to the service;
+# the handshake also proves the service holds it before clients unpickle
+# its replies
+# ===============================
+KEY_PATH = os.environ.get("INFERENCE_KEY_FILE", os.path.join("data", "inference.key"))
+
+def load_authkey(create=False):
+    """The install's random key; created by the service, None if missing."""
+    if not os.path.exists(KEY_PATH):
+        if not create:
+            return None
+        os.makedirs(os.path.dirname(KEY_PATH) or ".", exist_ok=True)
+        try:
+            fd = os.open(KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass
+
+    if os.name == "posix" and os.stat(KEY_PATH).st_mode & 0o077:
+        raise PermissionError(f"{KEY_PATH} is readable by other users; "
+                              f"run: chmod 600 {KEY_PATH}")
+
+    with open(KEY_PATH) as f:
+        return f.read().strip().encode()
+
+# ===============================
+# SERVER
+# models are loaded and warmed up once; every session connects to it
+# ===============================
+class InferenceService:
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        self.address = (host, port)
+        self.started = time.time()
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+        self.clients = 0
+        self.served = {"emotion": 0, "phone": 0}
+        self.warmup_seconds = None
+
+        self.emotion_model = None
+        self.phone_batcher = None
+        self.emotion_batcher = None
+        self.single_batcher = None
+
+    # ---------- models ----------
+    def load_models(self):
+        import detectors
+        from face_tracker import load_emotion_model, analyze_batch, classify_batch
+
+        t0 = time.time()
+        yolo = detectors.load_yolo()
+        self.emotion_model = load_emotion_model()
+
+        self.phone_batcher = BatchingDetector(
+            detectors.make_batch_phone_detector(yolo))
+        self.emotion_batcher = BatchingDetector(
+            lambda items: analyze_batch(items, self.emotion_model))
+        self.single_batcher = BatchingDetector(
+            lambda frames: [detectors.detect_emotion(f) for f in frames])
+
+        # first calls build graphs and allocate buffers; pay that now
+        blank = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.phone_batcher(blank)
+        classify_batch(self.emotion_model, [blank[:96, :96]])
+        self.single_batcher(blank)
+
+        self.warmup_seconds = round(time.time() - t0, 2)
+        self.ready.set()
+        print(f"Models ready in {self.warmup_seconds}s")
+
+    # ---------- requests ----------
+    def status(self):
+        return {
+            "ok": True,
+            "ready": self.ready.is_set(),
+            "uptime": round(time.time() - self.started, 1),
+            "warmup_seconds": self.warmup_seconds,
+            "clients": self.clients,
+            "served": dict(self.served),
+            "batching": {
+                name: b.stats() for name, b in (
+                    ("phone", self.phone_batcher),
+                    ("emotion", self.emotion_batcher)
+                ) if b is not None
+            }
+        }
+
+    def handle(self, request, state):
+        op = request.get("op")
+
+        if op in ("health", "ready"):
+            return self.status()
+
+        if not self.ready.is_set():
+            return {"ok": False, "error": "models are still loading"}
+
+        if op == "phone":
+            result = self.phone_batcher(request["frame"])
+        elif op == "emotion" and request.get("multi_face", True):
+            # face tracks belong to the connection, the model is shared
+            if "analyzer" not in state:
+                from face_tracker import MultiFaceAnalyzer
+                state["analyzer"] = MultiFaceAnalyzer(model=self.emotion_model)
+            result = self.emotion_batcher((state["analyzer"], request["frame"]))
+        elif op == "emotion":
+            result = self.single_batcher(request["frame"])
+        elif op == "face_stats":
+            analyzer = state.get("analyzer")
+            return {"ok": True, "result": analyzer.stats() if analyzer else None}
+        else:
+            return {"ok": False, "error": f"unknown op {op!r}"}
+
+        with self.lock:
+            self.served[op] += 1
+        return {"ok": True, "result": result}
+
+    def serve_connection(self, conn):
+        with self.lock:
+            self.clients += 1
+        state = {}
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    response = self.handle(request, state)
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                conn.send(response)
+        finally:
+            conn.close()
+            with self.lock:
+                self.clients -= 1
+
+    def serve_forever(self):
+        # accept health checks while the models are still loading
+        threading.Thread(target=self.load_models, daemon=True).start()
+
+        with Listener(self.address, authkey=load_authkey(create=True)) as listener:
+            print("Inference service listening on %s:%d" % self.address)
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    # a client that hung up or sent the wrong authkey
+                    continue
+                threading.Thread(target=self.serve_connection, args=(conn,),
+                                 daemon=True).start()
+
+
+# ===============================
+# CLIENT
+# ===============================
+# consecutive connection errors before a detector loads its model locally
+MAX_CONNECTION_ERRORS = 3
+
+class RemoteDetector:
+    """
+    Callable stand-in for a local detector that forwards frames to the
+    service. One connection per detector, so the emotion and phone
+    workers of a pipeline do not wait on each other.
+
+    A lost connection is re-opened on the next call; after
+    MAX_CONNECTION_ERRORS failures in a row the detector switches for
+    good to the one built by `fallback()`, so a dead service costs a
+    few samples instead of the rest of the session.
+    """
+
+    def __init__(self, op, multi_face=True, address=None, fallback=None):
+        self.op = op
+        self.multi_face = multi_face
+        self.address = address or (SERVICE_HOST, SERVICE_PORT)
+        self.fallback = fallback
+        self.lock = threading.Lock()
+
+        self.authkey = load_authkey()
+        self.conn = Client(self.address, authkey=self.authkey)
+        self.local = None
+        self.failures = 0
+        self.connection_errors = 0
+        self.reconnects = 0
+        self.fell_back_at = None
+
+    def connection_failed(self):
+        self.failures += 1
+        self.connection_errors += 1
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+        if self.failures >= MAX_CONNECTION_ERRORS and self.fallback is not None:
+            print(f"Inference service unreachable; loading the {self.op} "
+                  f"model locally.")
+            self.local = self.fallback()
+            self.fell_back_at = time.time()
+
+    def request(self, message):
+        with self.lock:
+            try:
+                if self.conn is None:
+                    self.conn = Client(self.address, authkey=self.authkey)
+                    self.reconnects += 1
+                self.conn.send(message)
+                response = self.conn.recv()
+            except (OSError, EOFError):
+                self.connection_failed()
+                raise
+            self.failures = 0
+
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "inference failed"))
+        return response
+
+    def __call__(self, frame):
+        if self.local is not None:
+            return self.local(frame)
+        return self.request({"op": self.op, "frame": frame,
+                             "multi_face": self.multi_face})["result"]
+
+    def stats(self):
+        if self.local is not None:
+            return self.local.stats() if hasattr(self.local, "stats") else None
+        return self.request({"op": "face_stats"})["result"]
+
+    def connection_stats(self):
+        return {
+            "connection_errors": self.connection_errors,
+            "reconnects": self.reconnects,
+            "fell_back_to_local": self.local is not None,
+            "fell_back_at": self.fell_back_at
+        }
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def service_status(address=None):
+    """Health of a running service, or None when nothing is listening."""
+    address = address or (SERVICE_HOST, SERVICE_PORT)
+    authkey = load_authkey()
+    if authkey is None:
+        return None
+    try:
+        conn = Client(address, authkey=authkey)
+    except (OSError, EOFError, AuthenticationError):
+        return None
+
+    try:
+        conn.send({"op": "health"})
+        return conn.recv()
+    except (OSError, EOFError):
+        return None
+    finally:
+        conn.close()
+
+def connect_detectors(multi_face=True, address=None):
+    """(detect_emotion, detect_phone) backed by a ready service, or None."""
+    try:
+        status = service_status(address)
+    except PermissionError as e:
+        print("Not using the inference service:", e)
+        return None
+    if not status or not status.get("ready"):
+        return None
+
+    def local_emotion():
+        import detectors
+        return detectors.make_emotion_detector(multi_face)
+
+    def local_phone():
+        import detectors
+        return detectors.make_phone_detector(detectors.load_yolo())
+
+    emotion = None
+    try:
+        emotion = RemoteDetector("emotion", multi_face, address,
+                                 fallback=local_emotion)
+        phone = RemoteDetector("phone", address=address, fallback=local_phone)
+    except (OSError, EOFError, AuthenticationError) as e:
+        # the service went away between the health check and connecting
+        if emotion is not None:
+            emotion.close()
+        print("Not using the inference service:", e)
+        return None
+    return emotion, phone
+
+
+# ===============================
+# ENTRY POINT
+# ===============================
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep DeepFace and YOLO loaded for run_session.py."
+    )
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--check", action="store_true",
+                        help="print the health of a running service and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        status = service_status((SERVICE_HOST, args.port))
+        print(status or "Inference service is not running.")
+        raise SystemExit(0 if status and status["ready"] else 1)
+
+    InferenceService(port=args.port).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
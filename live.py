@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import queue
+import threading
+from profiling import compact_profile
+
+LIVE_DIR = os.path.join("data", "live")
+
+# logs untouched this long (ended or abandoned sessions) are deleted
+LOG_RETENTION = 3600
+
+def live_path(session_id):
+    return os.path.join(LIVE_DIR, f"{session_id}.jsonl")
+
+def prune_logs(max_age=LOG_RETENTION):
+    """Delete live logs not written to for max_age seconds; returns their ids."""
+    if not os.path.isdir(LIVE_DIR):
+        return []
+
+    now = time.time()
+    pruned = []
+    for file in os.listdir(LIVE_DIR):
+        if not file.endswith(".jsonl"):
+            continue
+        path = os.path.join(LIVE_DIR, file)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                pruned.append(file[:-len(".jsonl")])
+        except FileNotFoundError:
+            continue
+    return pruned
+
+# ===============================
+# PUBLISHER (run_session.py side)
+# ===============================
+class LivePublisher:
+    """
+    Appends one JSON line per interval to data/live/<session_id>.jsonl
+    with the rolling counts and the events seen since the last line.
+    """
+
+    def __init__(self, session_id, start_time, interval=1.0, max_events=200):
+        os.makedirs(LIVE_DIR, exist_ok=True)
+        # the dashboard may not be running to clean up after past sessions
+        prune_logs()
+        self.session_id = session_id
+        self.start_time = start_time
+        self.interval = interval
+        self.max_events = max_events
+
+        self.file = open(live_path(session_id), "a")
+        self.lock = threading.Lock()
+        self.events = []
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.pipeline = None
+
+    def record(self, emotion, face_id=None, count=1, t=None):
+        t = round((time.time() if t is None else t) - self.start_time, 2)
+        with self.lock:
+            if len(self.events) < self.max_events:
+                self.events.append([t, emotion, face_id, count])
+
+    def write(self, message):
+        self.file.write(json.dumps(message) + "\n")
+        self.file.flush()
+
+    def snapshot(self, kind):
+        with self.lock:
+            events, self.events = self.events, []
+
+        p = self.pipeline
+        profile = compact_profile(p.stats()["profile"])
+        with p.lock:
+            return {
+                "type": kind,
+                "session_id": self.session_id,
+                "elapsed": round(time.time() - self.start_time, 1),
+                "counts": dict(p.emotion_counts),
+                "total_frames": p.total_frames,
+                "total_faces_analyzed": p.total_faces_analyzed,
+                "profile": profile,
+                "events": events
+            }
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write(self.snapshot("update"))
+
+    def start(self, pipeline):
+        self.pipeline = pipeline
+        self.write({"type": "start", "session_id": self.session_id,
+                    "started_at": self.start_time})
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.write(self.snapshot("end"))
+        self.file.close()
+
+
+# ===============================
+# HUB (Flask side)
+# one thread tails every live log and fans messages out to subscribers,
+# so browsers never read the files themselves
+# ===============================
+class LiveHub:
+    def __init__(self, poll_interval=0.5, idle_timeout=30, client_queue=100):
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.client_queue = client_queue
+
+        self.lock = threading.Lock()
+        self.offsets = {}
+        self.partial = {}
+        self.state = {}          # session_id -> latest message
+        self.updated = {}        # session_id -> time of last message
+        self.subscribers = {}    # session_id -> set of queues
+        self.thread = None
+
+    def ensure_running(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.poll()
+            time.sleep(self.poll_interval)
+
+    def forget(self, session_id):
+        with self.lock:
+            self.state.pop(session_id, None)
+            self.updated.pop(session_id, None)
+        self.offsets.pop(session_id, None)
+        self.partial.pop(session_id, None)
+
+    def poll(self):
+        for session_id in prune_logs():
+            self.forget(session_id)
+
+        if not os.path.isdir(LIVE_DIR):
+            return
+
+        now = time.time()
+        for file in os.listdir(LIVE_DIR):
+            if not file.endswith(".jsonl"):
+                continue
+            session_id = file[:-len(".jsonl")]
+            path = os.path.join(LIVE_DIR, file)
+
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            size = st.st_size
+
+            # logs already idle when first seen (e.g. after a restart) are
+            # finished sessions; skip to their end instead of replaying
+            if session_id not in self.offsets and now - st.st_mtime > self.idle_timeout:
+                self.offsets[session_id] = size
+                continue
+
+            offset = self.offsets.get(session_id, 0)
+            if size <= offset:
+                continue
+
+            with open(path, "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+            self.offsets[session_id] = offset + len(chunk)
+
+            data = self.partial.pop(session_id, b"") + chunk
+            lines = data.split(b"\n")
+            if lines[-1]:
+                self.partial[session_id] = lines[-1]
+
+            for line in lines[:-1]:
+                try:
+                    self.publish(session_id, json.loads(line))
+                except ValueError:
+                    continue
+
+    def publish(self, session_id, message):
+        with self.lock:
+            if message.get("type") == "end":
+                # the saved summary takes over; keep no state for it
+                self.state.pop(session_id, None)
+                self.updated.pop(session_id, None)
+            elif message.get("type") != "start":
+                self.state[session_id] = message
+                self.updated[session_id] = time.time()
+            clients = list(self.subscribers.get(session_id, ()))
+
+        for q in clients:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def active_sessions(self):
+        self.ensure_running()
+        now = time.time()
+        with self.lock:
+            return sorted(
+                sid for sid, msg in self.state.items()
+                if msg.get("type") != "end"
+                and now - self.updated.get(sid, 0) < self.idle_timeout
+            )
+
+    def latest(self, session_id):
+        with self.lock:
+            return self.state.get(session_id)
+
+    def subscribe(self, session_id):
+        self.ensure_running()
+        q = queue.Queue(maxsize=self.client_queue)
+        with self.lock:
+            self.subscribers.setdefault(session_id, set()).add(q)
+            latest = self.state.get(session_id)
+        if latest is not None:
+            q.put_nowait(latest)
+        return q
+
+    def unsubscribe(self, session_id, q):
+        with self.lock:
+            self.subscribers.get(session_id, set()).discard(q)
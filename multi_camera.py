@@ -0,0 +1,124 @@
+import os
+import time
+from emotion_utils import create_session_id
+from pipeline import BatchingDetector
+from face_tracker import MultiFaceAnalyzer, analyze_batch, load_emotion_model
+from run_session import MonitoredSource
+import detectors
+
+# ===============================
+# MULTI-CAMERA SESSION
+# ===============================
+def parse_source(source):
+    return int(source) if str(source).isdigit() else source
+
+def remote_sources(sources, multi_face):
+    """
+    Per-source (detect_emotion, detect_phone) from a running inference
+    service, or None. Each connection keeps its own face tracks; the
+    service batches requests from all of them.
+    """
+    from inference_service import connect_detectors
+
+    detectors_per_source = []
+    for _ in sources:
+        remote = connect_detectors(multi_face)
+        if remote is None:
+            return None
+        detectors_per_source.append(remote)
+    return detectors_per_source
+
+def run_multi(sources, duration_minutes, multi_face=True, use_service=True):
+    """
+    Monitor several cameras/files from one process. YOLO and the emotion
+    model are loaded once and shared; every source still gets its own
+    session ID, counts, timeline and image folder.
+    """
+    base_id = create_session_id()
+
+    remote = remote_sources(sources, multi_face) if use_service else None
+    if remote:
+        print("Using the running inference service.")
+        sessions = [
+            MonitoredSource(
+                parse_source(source),
+                detect_emotion=detect_emotion,
+                detect_phone=detect_phone,
+                session_id=f"{base_id}_cam{i}",
+                face_analyzer=detect_emotion if multi_face else None
+            )
+            for i, (source, (detect_emotion, detect_phone))
+            in enumerate(zip(sources, remote))
+        ]
+        from inference_service import service_status
+        shared_stats = lambda: {"service": (service_status() or {}).get("batching")}
+        return monitor(sessions, base_id, duration_minutes, shared_stats)
+
+    # ===============================
+    # SHARED MODELS
+    # ===============================
+    phone_batcher = BatchingDetector(
+        detectors.make_batch_phone_detector(detectors.load_yolo())
+    )
+
+    if multi_face:
+        emotion_model = load_emotion_model()
+        emotion_batcher = BatchingDetector(
+            lambda items: analyze_batch(items, emotion_model)
+        )
+    else:
+        emotion_batcher = BatchingDetector(
+            lambda frames: [detectors.detect_emotion(f) for f in frames]
+        )
+
+    sessions = []
+
+    def source_emotion_detector(analyzer):
+        # each source keeps its own face tracker; the model is shared
+        return lambda frame: emotion_batcher((analyzer, frame))
+
+    for i, source in enumerate(sources):
+        analyzer = None
+        detect_emotion = emotion_batcher
+        if multi_face:
+            analyzer = MultiFaceAnalyzer(model=emotion_model)
+            detect_emotion = source_emotion_detector(analyzer)
+
+        sessions.append(MonitoredSource(
+            parse_source(source),
+            detect_emotion=detect_emotion,
+            detect_phone=phone_batcher,
+            session_id=f"{base_id}_cam{i}",
+            face_analyzer=analyzer
+        ))
+
+    shared_stats = lambda: {
+        "phone": phone_batcher.stats(),
+        "emotion": emotion_batcher.stats()
+    }
+    return monitor(sessions, base_id, duration_minutes, shared_stats)
+
+def monitor(sessions, base_id, duration_minutes, shared_stats):
+    print(f"Monitoring {len(sessions)} sources. Press Ctrl+C to stop.")
+    for s in sessions:
+        print(" ", s.session_id, "<-", s.source)
+        s.start()
+
+    deadline = time.time() + duration_minutes * 60
+    try:
+        while time.time() < deadline:
+            if all(s.pipeline.capture_done.is_set() for s in sessions):
+                break
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        print("Session interrupted.")
+
+    for s in sessions:
+        s.finish(duration_minutes, source_info={
+            "type": "file" if os.path.isfile(str(s.source)) else "camera",
+            "path": str(s.source),
+            "group": base_id,
+            "shared_models": shared_stats()
+        })
+
+    return [s.session_id for s in sessions]
@@ -0,0 +1,381 @@
+import threading
+import queue
+import time
+from emotion_utils import init_emotion_counts
+from profiling import Profiler
+
+MAX_BATCH = 8
+MAX_BATCH_WAIT = 0.01
+
+# ===============================
+# BOUNDED QUEUE (LATEST FRAME WINS)
+# ===============================
+class LatestQueue:
+    """Bounded queue that drops the oldest item when full."""
+
+    def __init__(self, maxsize):
+        self.q = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.max_depth = 0
+        self.put_count = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self.q.put_nowait(item)
+                break
+            except queue.Full:
+                try:
+                    self.q.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+        self.put_count += 1
+        self.max_depth = max(self.max_depth, self.q.qsize())
+
+    def get(self, timeout=0.1):
+        try:
+            return self.q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self):
+        return {
+            "maxsize": self.q.maxsize,
+            "depth": self.q.qsize(),
+            "max_depth": self.max_depth,
+            "enqueued": self.put_count,
+            "dropped": self.dropped
+        }
+
+
+# ===============================
+# SHARED, BATCHING MODEL FRONT-END
+# ===============================
+class BatchingDetector:
+    """
+    Lets many pipeline threads share one model. Calls are queued and run
+    by a single thread in batches of up to max_batch, in arrival order.
+    Each source's worker waits for its own result before asking again,
+    so every source gets at most one slot per batch.
+    """
+
+    def __init__(self, run_batch, max_batch=MAX_BATCH, max_wait=MAX_BATCH_WAIT):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.items = 0
+
+        threading.Thread(target=self.loop, daemon=True).start()
+
+    def __call__(self, item):
+        done = threading.Event()
+        slot = {"done": done}
+        self.requests.put((item, slot))
+        done.wait()
+
+        if "error" in slot:
+            raise slot["error"]
+        return slot["result"]
+
+    def loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.requests.get(
+                        timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.run_batch([item for item, _ in batch])
+                for (_, slot), result in zip(batch, results):
+                    slot["result"] = result
+            except Exception as e:
+                for _, slot in batch:
+                    slot["error"] = e
+
+            self.batches += 1
+            self.items += len(batch)
+            for _, slot in batch:
+                slot["done"].set()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / max(self.batches, 1), 2)
+        }
+
+
+def as_face_results(result):
+    if result is None:
+        return []
+    if isinstance(result, str):
+        return [(None, result, None)]
+    return result
+
+def run_scheduled(scheduler, frame, now):
+    return scheduler is None or scheduler.should_run(frame, now)
+
+
+# ===============================
+# STAGED SESSION PIPELINE
+# ===============================
+class SessionPipeline:
+    """
+    capture -> (emotion worker, phone worker) -> writer
+
+    detect_emotion(frame) returns a mapped emotion or None, or a list of
+    (face_id, mapped_emotion, box) for every face in the frame.
+    detect_phone(frame) returns the (x, y, w, h) boxes of phones found.
+    save_image(frame, emotion, boxes) writes one evidence image.
+
+    Counting stays on a fixed clock (one emotion sample per
+    emotion_interval, one phone sample per phone_interval), independent
+    of the camera's frame rate. The optional
+    schedulers decide whether a sample runs the model or reuses the last
+    result, so counts stay comparable per unit of time.
+
+    Every stage is timed by self.profiler; stats()["profile"] holds the
+    latency percentiles, frame rates and frames dropped by the queues.
+    """
+
+    def __init__(self, cap, detect_emotion, detect_phone, save_image,
+                 emotion_counts, emotion_interval=0.8, writer_queue_size=32,
+                 emotion_scheduler=None, phone_scheduler=None, timeline=None,
+                 live=None, frame_interval=0, profiler=None, phone_interval=0.8):
+        self.cap = cap
+        self.detect_emotion = detect_emotion
+        self.detect_phone = detect_phone
+        self.save_image = save_image
+        self.emotion_interval = emotion_interval
+        self.phone_interval = phone_interval
+        # > 0 paces reads from video files to their real frame rate
+        self.frame_interval = frame_interval
+        self.emotion_scheduler = emotion_scheduler
+        self.phone_scheduler = phone_scheduler
+        # event sinks: the on-disk timeline and the live dashboard feed
+        self.recorders = [r for r in (timeline, live) if r is not None]
+        self.profiler = profiler or Profiler()
+
+        self.emotion_counts = emotion_counts
+        self.total_frames = 0
+        self.total_faces_analyzed = 0
+        self.face_counts = {}
+        self.lock = threading.Lock()
+
+        self.emotion_queue = LatestQueue(1)
+        self.phone_queue = LatestQueue(1)
+        self.writer_queue = LatestQueue(writer_queue_size)
+
+        self.stage_frames = {
+            "capture": 0,
+            "emotion": 0,
+            "phone": 0,
+            "writer": 0
+        }
+        # sample slots that passed while a detection overran its interval;
+        # frames replaced between samples are by design and not counted
+        self.missed_samples = {"emotion": 0, "phone": 0}
+
+        self.stop_event = threading.Event()
+        # set only once capture and inference have exited, so evidence
+        # they queue while finishing a detection is still written
+        self.writer_stop = threading.Event()
+        self.capture_done = threading.Event()
+        self.threads = []
+        self.writer_thread = None
+
+    # ---------- stages ----------
+    def count_missed(self, stage, interval, started):
+        if interval > 0:
+            self.missed_samples[stage] += int((time.time() - started) // interval)
+
+    def capture_loop(self):
+        next_read = time.time()
+        while not self.stop_event.is_set():
+            if self.frame_interval:
+                self.stop_event.wait(max(next_read - time.time(), 0))
+                next_read += self.frame_interval
+
+            with self.profiler.stage("capture"):
+                ret, frame = self.cap.read()
+            if not ret:
+                break
+
+            with self.lock:
+                self.total_frames += 1
+            self.stage_frames["capture"] += 1
+            self.profiler.tick("capture")
+
+            self.emotion_queue.put(frame)
+            self.phone_queue.put(frame)
+
+        self.capture_done.set()
+
+    def emotion_loop(self):
+        last_analysis = 0
+        last_mapped = None
+
+        while not self.stop_event.is_set():
+            wait = self.emotion_interval - (time.time() - last_analysis)
+            if wait > 0:
+                self.stop_event.wait(wait)
+                continue
+
+            frame = self.emotion_queue.get()
+            if frame is None:
+                continue
+
+            last_analysis = time.time()
+            self.stage_frames["emotion"] += 1
+            self.profiler.tick("emotion")
+
+            fresh = run_scheduled(self.emotion_scheduler, frame, last_analysis)
+            if fresh:
+                started = time.time()
+                try:
+                    with self.profiler.stage("emotion"):
+                        last_mapped = self.detect_emotion(frame)
+                except Exception:
+                    last_mapped = None
+                self.count_missed("emotion", self.emotion_interval, started)
+                if self.emotion_scheduler is not None:
+                    self.emotion_scheduler.record(frame, started, time.time())
+
+            faces = as_face_results(last_mapped)
+            if not faces:
+                continue
+
+            with self.lock:
+                for face_id, mapped, _ in faces:
+                    self.emotion_counts[mapped] += 1
+                    self.total_faces_analyzed += 1
+
+                    if face_id is not None:
+                        per_face = self.face_counts.setdefault(
+                            str(face_id), init_emotion_counts())
+                        per_face[mapped] += 1
+
+            for recorder in self.recorders:
+                for face_id, mapped, _ in faces:
+                    recorder.record(mapped, face_id, t=last_analysis)
+
+            if fresh:
+                for mapped in sorted({m for _, m, _ in faces}):
+                    boxes = [b for _, m, b in faces if m == mapped and b]
+                    self.writer_queue.put((frame, mapped, boxes))
+
+    def phone_loop(self):
+        last_sample = 0
+        last_phones = []
+
+        while not self.stop_event.is_set():
+            wait = self.phone_interval - (time.time() - last_sample)
+            if wait > 0:
+                self.stop_event.wait(wait)
+                continue
+
+            frame = self.phone_queue.get()
+            if frame is None:
+                continue
+
+            last_sample = time.time()
+            self.stage_frames["phone"] += 1
+            self.profiler.tick("phone")
+
+            fresh = run_scheduled(self.phone_scheduler, frame, last_sample)
+            if fresh:
+                started = time.time()
+                try:
+                    with self.profiler.stage("phone"):
+                        last_phones = self.detect_phone(frame)
+                except Exception:
+                    last_phones = []
+                self.count_missed("phone", self.phone_interval, started)
+                if self.phone_scheduler is not None:
+                    self.phone_scheduler.record(frame, started, time.time())
+
+            if not last_phones:
+                continue
+
+            with self.lock:
+                self.emotion_counts["using_phone"] += len(last_phones)
+
+            for recorder in self.recorders:
+                recorder.record("using_phone", count=len(last_phones))
+
+            if fresh:
+                self.writer_queue.put((frame, "using_phone", last_phones))
+
+    def writer_loop(self):
+        # keep draining after stop so queued evidence is not lost
+        while not (self.writer_stop.is_set() and self.writer_queue.q.empty()):
+            item = self.writer_queue.get()
+            if item is None:
+                continue
+
+            frame, emotion, boxes = item
+            try:
+                with self.profiler.stage("writer"):
+                    self.save_image(frame, emotion, boxes)
+                self.stage_frames["writer"] += 1
+            except Exception:
+                pass
+
+    # ---------- control ----------
+    def start(self):
+        for target in [self.capture_loop, self.emotion_loop, self.phone_loop]:
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self.threads.append(t)
+
+        self.writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def run_until(self, deadline):
+        """Block until the deadline passes or the capture source ends."""
+        while time.time() < deadline:
+            if self.capture_done.wait(0.2):
+                break
+
+    def stop(self):
+        self.stop_event.set()
+        for t in self.threads:
+            t.join()
+
+        # producers are done; let the writer drain the queue and exit
+        self.writer_stop.set()
+        if self.writer_thread is not None:
+            self.writer_thread.join()
+
+    def stats(self):
+        schedulers = {}
+        if self.emotion_scheduler is not None:
+            schedulers["emotion"] = self.emotion_scheduler.stats()
+        if self.phone_scheduler is not None:
+            schedulers["phone"] = self.phone_scheduler.stats()
+
+        queues = {
+            "emotion": self.emotion_queue,
+            "phone": self.phone_queue,
+            "writer": self.writer_queue
+        }
+        profile = self.profiler.summary()
+        profile["missed_samples"] = dict(self.missed_samples)
+        # evidence images lost because the writer fell behind
+        profile["dropped_evidence"] = self.writer_queue.dropped
+
+        return {
+            "frames": dict(self.stage_frames),
+            "profile": profile,
+            "schedulers": schedulers,
+            "queues": {n: q.stats() for n, q in queues.items()}
+        }
@@ -0,0 +1,155 @@
+import time
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# upper edges (ms) of the latency histogram buckets; the last is open
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# percentiles come from the most recent samples of each stage
+MAX_SAMPLES = 2048
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    i = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[i]
+
+# ===============================
+# ONE STAGE
+# ===============================
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.samples.append(ms)
+
+        for i, edge in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= edge:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def summary(self):
+        recent = sorted(self.samples)
+        labels = [f"<={edge}" for edge in LATENCY_BUCKETS_MS] + \
+                 [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else None,
+            "p50_ms": round(percentile(recent, 50), 2) if recent else None,
+            "p95_ms": round(percentile(recent, 95), 2) if recent else None,
+            "max_ms": round(self.max, 2),
+            "histogram_ms": {l: n for l, n in zip(labels, self.buckets) if n}
+        }
+
+# ===============================
+# FRAME RATE
+# frames are counted per wall-clock second; the histogram maps an fps
+# value to the number of seconds that ran at it
+# ===============================
+class RateMeter:
+    def __init__(self):
+        self.second = None
+        self.current = 0
+        self.frames = 0
+        self.first = None
+        self.last = None
+        self.histogram = Counter()
+
+    def tick(self, now=None):
+        now = time.time() if now is None else now
+        second = int(now)
+
+        if self.first is None:
+            self.first = now
+        elif second != self.second:
+            self.histogram[self.current] += 1
+            # seconds with no frames at all (a stalled source)
+            self.histogram[0] += max(second - self.second - 1, 0)
+            self.current = 0
+
+        self.second = second
+        self.current += 1
+        self.frames += 1
+        self.last = now
+
+    def summary(self):
+        seconds = sorted(self.histogram.elements())
+        elapsed = (self.last - self.first) if self.frames > 1 else 0
+        return {
+            "frames": self.frames,
+            "mean_fps": round((self.frames - 1) / elapsed, 2) if elapsed else None,
+            "p50_fps": percentile(seconds, 50),
+            "p5_fps": percentile(seconds, 5),
+            "histogram": {str(fps): n for fps, n in sorted(self.histogram.items())}
+        }
+
+# ===============================
+# PROFILER
+# ===============================
+class Profiler:
+    """
+    Per-stage latency timers plus frame-rate meters. Cheap enough to
+    leave on: one perf_counter pair and a few integer updates per call.
+
+        with profiler.stage("emotion"):
+            detect_emotion(frame)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.rates = {}
+
+    def record(self, name, seconds):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.add(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def tick(self, name, now=None):
+        with self.lock:
+            meter = self.rates.get(name)
+            if meter is None:
+                meter = self.rates[name] = RateMeter()
+            meter.tick(now)
+
+    def summary(self):
+        with self.lock:
+            return {
+                "stages": {n: s.summary() for n, s in sorted(self.stages.items())},
+                "rates": {n: m.summary() for n, m in sorted(self.rates.items())}
+            }
+
+
+def compact_profile(profile):
+    """The headline numbers of a summary(): fps, p95 per stage, misses."""
+    if not profile:
+        return None
+    capture = profile.get("rates", {}).get("capture", {})
+    return {
+        "fps": capture.get("mean_fps"),
+        "p95_ms": {n: s["p95_ms"] for n, s in profile.get("stages", {}).items()},
+        "missed_samples": profile.get("missed_samples", {}),
+        "dropped_evidence": profile.get("dropped_evidence", 0)
+    }
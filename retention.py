@@ -0,0 +1,276 @@
+import os
+import glob
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime
+import cv2
+import numpy as np
+import session_store
+from emotion_utils import (
+    EMOTIONS,
+    IMAGE_ROOT,
+    SESSION_DIR,
+    ARCHIVE_DIR,
+    archive_path,
+    emotion_dir,
+    scan_emotion_dir,
+    ensure_store
+)
+from image_writer import thumbnail_path, make_thumbnail
+from image_pack import PackWriter, read_index, read_blob
+from live import live_path
+from batch import BATCH_DIR
+
+# ===============================
+# POLICY
+# full frames for FULL_DAYS, thumbnails until THUMB_DAYS, then the
+# session keeps only its counts. Run daily, e.g. from cron:
+#   python retention.py
+# ===============================
+FULL_DAYS = 7
+THUMB_DAYS = 90
+THUMB_QUALITY = 60
+
+# image folders without a session JSON are left alone this long, so
+# sessions still recording (or batch jobs still running) are never lost
+GC_GRACE_HOURS = 24
+
+def tier_for(age_days, full_days=FULL_DAYS, thumb_days=THUMB_DAYS):
+    if age_days < full_days:
+        return "full"
+    if age_days < thumb_days:
+        return "thumbs"
+    return "counts"
+
+# ===============================
+# IMAGES
+# ===============================
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def small_thumb(data, quality=THUMB_QUALITY):
+    """Re-encode JPEG bytes as a thumbnail at a lower quality."""
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return data
+    ok, out = cv2.imencode(".jpg", make_thumbnail(frame),
+                           [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return out.tobytes() if ok and len(out) < len(data) else data
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(root, f))
+               for root, _, files in os.walk(folder) for f in files)
+
+# ===============================
+# PACKING
+# ===============================
+def pack_folder(session_id, tier):
+    """
+    Move a session's image folder into data/archive/<id>.pack. Face and
+    phone crops are not served by any route, so they are not kept.
+    """
+    writer = PackWriter(archive_path(session_id))
+    images = {}
+    try:
+        for emo in EMOTIONS:
+            folder = emotion_dir(session_id, emo)
+            entries = []
+            for name in scan_emotion_dir(folder):
+                path = os.path.join(folder, name)
+                full = read_file(path)
+
+                if tier == "full":
+                    thumb = thumbnail_path(path)
+                    thumb = read_file(thumb) if os.path.exists(thumb) \
+                        else small_thumb(full)
+                    entries.append({
+                        "name": name,
+                        "full": writer.add(full),
+                        "thumb": writer.add(thumb)
+                    })
+                else:
+                    # encode once from the original, not from a thumbnail
+                    entries.append({"name": name,
+                                    "thumb": writer.add(small_thumb(full))})
+            if entries:
+                images[emo] = entries
+    except BaseException:
+        writer.abort()
+        raise
+
+    writer.close({
+        "session_id": session_id,
+        "tier": tier,
+        "packed_at": datetime.now().isoformat(),
+        "images": images
+    })
+    shutil.rmtree(os.path.join(IMAGE_ROOT, session_id))
+
+def repack_thumbs(session_id, index):
+    """Rewrite a full-tier pack with only thumbnails of its full frames."""
+    source = archive_path(session_id)
+    writer = PackWriter(source)
+    images = {}
+    try:
+        for emo, entries in index["images"].items():
+            images[emo] = [
+                {"name": e["name"],
+                 "thumb": writer.add(small_thumb(read_blob(source, e["full"])))}
+                for e in entries
+            ]
+    except BaseException:
+        writer.abort()
+        raise
+
+    writer.close(dict(index, tier="thumbs", packed_at=datetime.now().isoformat(),
+                      images=images))
+
+# ===============================
+# GARBAGE COLLECTION
+# ===============================
+def sessions_with_json():
+    return {
+        f[len("session_"):-len(".json")] for f in os.listdir(SESSION_DIR)
+        if f.startswith("session_") and f.endswith(".json")
+    }
+
+def newest_mtime(folder):
+    paths = [folder] + [os.path.join(folder, d) for d in os.listdir(folder)]
+    return max(os.stat(p).st_mtime for p in paths)
+
+def busy_sessions(now, grace):
+    """Sessions a batch job or a live recording may still write to."""
+    busy = set()
+    for path in glob.glob(os.path.join(BATCH_DIR, "*.json")):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not state.get("completed"):
+            busy.add(state.get("session_id"))
+
+    if os.path.isdir(IMAGE_ROOT):
+        for sid in os.listdir(IMAGE_ROOT):
+            try:
+                if now - os.stat(live_path(sid)).st_mtime < grace:
+                    busy.add(sid)
+            except FileNotFoundError:
+                pass
+    return busy
+
+def collect_garbage(known, grace_hours=GC_GRACE_HOURS, dry_run=False):
+    """Remove image folders and packs whose session JSON was deleted."""
+    now = time.time()
+    grace = grace_hours * 3600
+    busy = busy_sessions(now, grace)
+    removed = []
+
+    if os.path.isdir(IMAGE_ROOT):
+        for sid in sorted(os.listdir(IMAGE_ROOT)):
+            folder = os.path.join(IMAGE_ROOT, sid)
+            if (sid in known or sid in busy or not os.path.isdir(folder)
+                    or now - newest_mtime(folder) < grace):
+                continue
+            removed.append((sid, folder_size(folder)))
+            if not dry_run:
+                shutil.rmtree(folder)
+
+    if os.path.isdir(ARCHIVE_DIR):
+        for f in sorted(os.listdir(ARCHIVE_DIR)):
+            sid = f[:-len(".pack")]
+            if not f.endswith(".pack") or sid in known:
+                continue
+            removed.append((sid, os.path.getsize(archive_path(sid))))
+            if not dry_run:
+                os.remove(archive_path(sid))
+
+    return removed
+
+# ===============================
+# RETENTION RUN
+# ===============================
+def apply_retention(full_days=FULL_DAYS, thumb_days=THUMB_DAYS,
+                    grace_hours=GC_GRACE_HOURS, dry_run=False):
+    """
+    Bring every session's images to the tier its age calls for and
+    collect orphans. Returns {action: [(session_id, bytes_before)]}.
+    """
+    ensure_store()
+    known = sessions_with_json()
+    saved = session_store.saved_times()
+    now = datetime.now()
+    report = {"packed": [], "reencoded": [], "expired": [], "orphans": []}
+
+    for sid in sorted(known):
+        try:
+            age = (now - datetime.fromisoformat(saved[sid])).total_seconds() / 86400
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        tier = tier_for(age, full_days, thumb_days)
+        folder = os.path.join(IMAGE_ROOT, sid)
+        pack = archive_path(sid)
+        has_folder = os.path.isdir(folder)
+        index = read_index(pack)
+
+        if tier == "counts":
+            if has_folder or os.path.exists(pack):
+                size = (folder_size(folder) if has_folder else 0) + \
+                       (os.path.getsize(pack) if os.path.exists(pack) else 0)
+                report["expired"].append((sid, size))
+                if not dry_run:
+                    shutil.rmtree(folder, ignore_errors=True)
+                    if os.path.exists(pack):
+                        os.remove(pack)
+
+        elif has_folder:
+            report["packed"].append((sid, folder_size(folder)))
+            if not dry_run:
+                pack_folder(sid, tier)
+
+        elif index and index["tier"] == "full" and tier == "thumbs":
+            report["reencoded"].append((sid, os.path.getsize(pack)))
+            if not dry_run:
+                repack_thumbs(sid, index)
+
+    report["orphans"] = collect_garbage(known, grace_hours, dry_run)
+    return report
+
+# ===============================
+# ENTRY POINT
+# ===============================
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pack, shrink and expire session evidence images."
+    )
+    parser.add_argument("--full-days", type=float, default=FULL_DAYS,
+                        help="keep full frames this many days")
+    parser.add_argument("--thumb-days", type=float, default=THUMB_DAYS,
+                        help="keep thumbnails this many days, then counts only")
+    parser.add_argument("--grace-hours", type=float, default=GC_GRACE_HOURS,
+                        help="age before an image folder without a session "
+                             "JSON is deleted")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report what would change without touching files")
+    args = parser.parse_args()
+
+    report = apply_retention(args.full_days, args.thumb_days,
+                             args.grace_hours, args.dry_run)
+
+    suffix = " (dry run)" if args.dry_run else ""
+    for action, items in report.items():
+        if items:
+            total = sum(size for _, size in items) / 2**20
+            print(f"{action}{suffix}: {len(items)} sessions ({total:.1f} MB)")
+            for sid, _ in items:
+                print("  ", sid)
+    if not any(report.values()):
+        print("Nothing to do.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,125 +1,248 @@
 import cv2
 import time
 import os
-import uuid
-from deepface import DeepFace
-from ultralytics import YOLO
+import argparse
 from emotion_utils import (
     create_session_id,
     init_emotion_counts,
     save_session_summary
 )
+from pipeline import SessionPipeline
+from scheduler import DetectionScheduler
+from image_writer import EvidenceWriter
+from timeline import TimelineWriter
+from live import LivePublisher
+from profiling import Profiler
+import detectors
+
+# track every face in the room with a stable ID and classify them in one
+# batch, instead of counting only the first face DeepFace returns
+MULTI_FACE_MODE = True
 
-# ===============================
-# SESSION SETUP
-# ===============================
-duration_minutes = int(input("Enter monitoring duration in minutes: "))
-session_id = create_session_id()
-
-emotion_counts = init_emotion_counts()
-start_time = time.time()
-last_analysis = 0
+EMOTIONS = ["focused", "laughing", "bored", "sad", "using_phone"]
 
-total_faces_analyzed = 0
-total_frames = 0
+# near-duplicate frames are skipped and at most MAX_IMAGES are kept
+MAX_IMAGES = 300
 
 # ===============================
-# NEW FEATURE: IMAGE STORAGE
+# DETECTION BUDGET
+# fraction of one CPU each detector may use; detectors also skip frames
+# where the scene has not changed, up to a maximum interval
 # ===============================
-EMOTIONS = ["focused", "laughing", "bored", "sad", "using_phone"]
-BASE_DIR = os.path.join("static", "emotions", session_id)
-
-for emo in EMOTIONS:
-    os.makedirs(os.path.join(BASE_DIR, emo), exist_ok=True)
-
-def save_emotion_image(frame, emotion):
-    filename = f"{uuid.uuid4().hex}.jpg"
-    path = os.path.join(BASE_DIR, emotion, filename)
-    cv2.imwrite(path, frame)
+EMOTION_CPU_BUDGET = 0.4
+PHONE_CPU_BUDGET = 0.3
+MAX_DETECT_INTERVAL = 5.0
+MOTION_THRESHOLD = 6.0
 
 # ===============================
-# MODELS
+# ONE MONITORED SOURCE
+# a camera or video file recorded as its own session
 # ===============================
-cap = cv2.VideoCapture(0)
-yolo = YOLO("yolov8n.pt")
-
-print("Session started. Press Ctrl+C to stop.")
+class MonitoredSource:
+    def __init__(self, source, detect_emotion, detect_phone, session_id=None,
+                 face_analyzer=None):
+        self.source = source
+        self.session_id = session_id or create_session_id()
+        self.face_analyzer = face_analyzer
 
-try:
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        total_frames += 1
-        current_time = time.time()
+        self.emotion_counts = init_emotion_counts()
+        self.start_time = time.time()
 
         # ===============================
-        # EMOTION DETECTION (every 0.8s)
+        # NEW FEATURE: IMAGE STORAGE
         # ===============================
-        if current_time - last_analysis > 0.8:
-            last_analysis = current_time
-            try:
-                results = DeepFace.analyze(
-                    frame,
-                    actions=["emotion"],
-                    enforce_detection=False
-                )
+        base_dir = os.path.join("static", "emotions", self.session_id)
 
-                dominant = results[0]["dominant_emotion"]
+        for emo in EMOTIONS:
+            os.makedirs(os.path.join(base_dir, emo), exist_ok=True)
 
-                if dominant in ["happy", "surprise"]:
-                    mapped = "laughing"
-                elif dominant == "neutral":
-                    mapped = "focused"
-                elif dominant in ["angry", "disgust", "fear"]:
-                    mapped = "bored"
-                else:
-                    mapped = "sad"
+        # per-stage timings, saved with the session under pipeline.profile
+        self.profiler = Profiler()
 
-                emotion_counts[mapped] += 1
-                total_faces_analyzed += 1
+        self.image_writer = EvidenceWriter(base_dir, max_images=MAX_IMAGES,
+                                           profiler=self.profiler)
 
-                # ✅ NEW: save emotion image
-                save_emotion_image(frame, mapped)
+        # every classification is appended to data/timelines/<session_id>.bin
+        self.timeline = TimelineWriter(self.session_id, self.start_time)
 
-            except Exception:
-                pass
+        # rolling counts for the live dashboard (data/live/<session_id>.jsonl)
+        self.live = LivePublisher(self.session_id, self.start_time)
+
+        self.cap = cv2.VideoCapture(source)
+
+        # recorded files are played back at their own frame rate
+        frame_interval = 0
+        if isinstance(source, str) and os.path.isfile(source):
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            frame_interval = 1 / fps if fps else 0
 
         # ===============================
-        # PHONE DETECTION (YOLO)
+        # PIPELINE
+        # capture -> emotion / phone workers -> image writer
         # ===============================
-        yolo_results = yolo(frame, verbose=False)
+        self.pipeline = SessionPipeline(
+            self.cap,
+            detect_emotion=detect_emotion,
+            detect_phone=detect_phone,
+            save_image=self.image_writer.save,
+            emotion_counts=self.emotion_counts,
+            emotion_interval=0.8,
+            phone_interval=0.8,
+            emotion_scheduler=DetectionScheduler(
+                cpu_budget=EMOTION_CPU_BUDGET,
+                max_interval=MAX_DETECT_INTERVAL,
+                motion_threshold=MOTION_THRESHOLD
+            ),
+            phone_scheduler=DetectionScheduler(
+                cpu_budget=PHONE_CPU_BUDGET,
+                max_interval=MAX_DETECT_INTERVAL,
+                motion_threshold=MOTION_THRESHOLD
+            ),
+            timeline=self.timeline,
+            live=self.live,
+            frame_interval=frame_interval,
+            profiler=self.profiler
+        )
+
+    def start(self):
+        self.pipeline.start()
+        self.live.start(self.pipeline)
+
+    def finish(self, duration_minutes, source_info=None):
+        self.pipeline.stop()
+        self.cap.release()
+        self.timeline.close()
+
+        pipeline_stats = self.pipeline.stats()
+        if self.face_analyzer is not None:
+            # a remote analyzer can fail here; never lose the summary to it
+            try:
+                pipeline_stats["faces"] = self.face_analyzer.stats()
+            except Exception as e:
+                pipeline_stats["faces"] = {"error": str(e)}
+
+        # connection errors and fallbacks of inference-service detectors
+        service = {
+            name: detector.connection_stats()
+            for name, detector in (("emotion", self.pipeline.detect_emotion),
+                                   ("phone", self.pipeline.detect_phone))
+            if hasattr(detector, "connection_stats")
+        }
+        if service:
+            pipeline_stats["inference_service"] = service
 
-        for r in yolo_results:
-            for box in r.boxes:
-                cls = int(box.cls[0])
-                label = yolo.names[cls]
+        # ===============================
+        # SAVE SESSION SUMMARY
+        # ===============================
+        save_session_summary(
+            session_id=self.session_id,
+            duration_minutes=duration_minutes,
+            emotion_counts=self.emotion_counts,
+            total_faces_analyzed=self.pipeline.total_faces_analyzed,
+            total_frames=self.pipeline.total_frames,
+            pipeline_stats=pipeline_stats,
+            image_stats=self.image_writer.stats(),
+            face_counts=self.pipeline.face_counts,
+            source=source_info
+        )
 
-                if label in ["cell phone", "phone"]:
-                    emotion_counts["using_phone"] += 1
+        # tell live viewers the session is over once the summary exists
+        self.live.close()
 
-                    # ✅ NEW: save phone image
-                    save_emotion_image(frame, "using_phone")
+        print("Session saved:", self.session_id)
+        print("Emotion counts:", self.emotion_counts)
 
-        if (current_time - start_time) / 60 >= duration_minutes:
-            break
 
-except KeyboardInterrupt:
-    print("Session interrupted.")
+# ===============================
+# LIVE SESSION
+# ===============================
+def load_detectors(multi_face=MULTI_FACE_MODE, use_service=True):
+    """
+    (detect_emotion, detect_phone), served by a warm inference_service.py
+    when one is running, otherwise loaded into this process.
+    """
+    if use_service:
+        from inference_service import connect_detectors
+        remote = connect_detectors(multi_face)
+        if remote:
+            print("Using the running inference service.")
+            return remote
+
+    print("Loading models locally (start inference_service.py to skip this).")
+    return (detectors.make_emotion_detector(multi_face),
+            detectors.make_phone_detector(detectors.load_yolo()))
+
+def run_live(duration_minutes, source=0, multi_face=MULTI_FACE_MODE,
+             use_service=True):
+    # ===============================
+    # MODELS
+    # ===============================
+    detect_emotion, detect_phone = load_detectors(multi_face, use_service)
+
+    session = MonitoredSource(
+        source,
+        detect_emotion=detect_emotion,
+        detect_phone=detect_phone,
+        face_analyzer=detect_emotion if multi_face else None
+    )
+
+    print("Session started. Press Ctrl+C to stop.")
+
+    session.start()
+    try:
+        session.pipeline.run_until(session.start_time + duration_minutes * 60)
+    except KeyboardInterrupt:
+        print("Session interrupted.")
+
+    session.finish(duration_minutes)
+    return session.session_id
 
-cap.release()
 
 # ===============================
-# SAVE SESSION SUMMARY
+# ENTRY POINT
 # ===============================
-save_session_summary(
-    session_id=session_id,
-    duration_minutes=duration_minutes,
-    emotion_counts=emotion_counts,
-    total_faces_analyzed=total_faces_analyzed,
-    total_frames=total_frames
-)
-
-print("Session saved:", session_id)
-print("Emotion counts:", emotion_counts)
+def main():
+    parser = argparse.ArgumentParser(
+        description="Monitor a live class, or analyze recorded lectures."
+    )
+    parser.add_argument("--duration", type=int,
+                        help="minutes to monitor (asked interactively if omitted)")
+    parser.add_argument("--sources", nargs="+", metavar="SOURCE",
+                        help="camera indices, stream URLs or video files to "
+                             "monitor together, one session each")
+    parser.add_argument("--batch", nargs="+", metavar="PATH",
+                        help="video files or folders to analyze offline")
+    parser.add_argument("--workers", type=int,
+                        help="batch worker processes (default: one per core)")
+    parser.add_argument("--chunk-seconds", type=int, default=60,
+                        help="length of the video chunks given to each worker")
+    parser.add_argument("--single-face", action="store_true",
+                        help="count only the first face DeepFace finds")
+    parser.add_argument("--local-models", action="store_true",
+                        help="load the models in this process even if the "
+                             "inference service is running")
+    args = parser.parse_args()
+
+    if args.batch:
+        from batch import run_batch
+        run_batch(args.batch, workers=args.workers,
+                  chunk_seconds=args.chunk_seconds,
+                  multi_face=not args.single_face)
+        return
+
+    duration_minutes = args.duration
+    if duration_minutes is None:
+        duration_minutes = int(input("Enter monitoring duration in minutes: "))
+
+    if args.sources:
+        from multi_camera import run_multi
+        run_multi(args.sources, duration_minutes,
+                  multi_face=not args.single_face,
+                  use_service=not args.local_models)
+    else:
+        run_live(duration_minutes, multi_face=not args.single_face,
+                 use_service=not args.local_models)
+
+
+if __name__ == "__main__":
+    main()
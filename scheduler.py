@@ -0,0 +1,95 @@
+import cv2
+
+# ===============================
+# CHEAP FRAME DIFFERENCING
+# ===============================
+MOTION_SIZE = (64, 48)
+
+def motion_thumb(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+
+def motion_score(prev_thumb, thumb):
+    """Mean absolute pixel difference (0-255) between two thumbnails."""
+    if prev_thumb is None:
+        return 255.0
+    return float(cv2.absdiff(prev_thumb, thumb).mean())
+
+
+# ===============================
+# ADAPTIVE DETECTION SCHEDULER
+# ===============================
+class DetectionScheduler:
+    """
+    Decides when a detector actually runs.
+
+    A detector runs when the scene changed since its last run (motion
+    above motion_threshold) and the CPU budget allows it, or when
+    max_interval has passed regardless of motion. cpu_budget is the
+    fraction of wall time the detector may occupy; the minimum gap
+    between runs grows with the measured inference cost to respect it.
+    """
+
+    def __init__(self, cpu_budget=0.5, min_interval=0.0, max_interval=5.0,
+                 motion_threshold=6.0, smoothing=0.2):
+        self.cpu_budget = cpu_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.smoothing = smoothing
+
+        self.avg_cost = 0.0
+        self.last_run = None
+        self.last_thumb = None
+
+        self.runs = 0
+        self.skipped_static = 0
+        self.skipped_budget = 0
+
+    @property
+    def interval(self):
+        budget_gap = self.avg_cost / self.cpu_budget if self.cpu_budget > 0 else 0
+        return min(max(self.min_interval, budget_gap), self.max_interval)
+
+    def should_run(self, frame, now):
+        if self.last_run is None:
+            return True
+
+        elapsed = now - self.last_run
+        if elapsed >= self.max_interval:
+            return True
+
+        if elapsed < self.interval:
+            self.skipped_budget += 1
+            return False
+
+        if motion_score(self.last_thumb, motion_thumb(frame)) < self.motion_threshold:
+            self.skipped_static += 1
+            return False
+
+        return True
+
+    def record(self, frame, started, finished, now=None):
+        """
+        Register a detector run. `now` is the clock should_run() is fed
+        with when that differs from wall time (e.g. video time offline).
+        """
+        cost = finished - started
+        if self.runs == 0:
+            self.avg_cost = cost
+        else:
+            self.avg_cost += self.smoothing * (cost - self.avg_cost)
+
+        self.runs += 1
+        self.last_run = started if now is None else now
+        self.last_thumb = motion_thumb(frame)
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "skipped_static": self.skipped_static,
+            "skipped_budget": self.skipped_budget,
+            "avg_cost_ms": round(self.avg_cost * 1000, 2),
+            "interval_s": round(self.interval, 3),
+            "cpu_budget": self.cpu_budget
+        }
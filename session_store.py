@@ -0,0 +1,135 @@
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+
+DB_PATH = os.path.join("data", "sessions.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    saved_at TEXT NOT NULL,
+    duration_minutes REAL,
+    total_faces_analyzed INTEGER,
+    data TEXT NOT NULL,
+    file_mtime INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_saved_at ON sessions (saved_at);
+"""
+
+# ===============================
+# CONNECTION
+# ===============================
+_initialized = set()
+
+@contextmanager
+def connect(db_path=DB_PATH):
+    """Open the store, commit on success and always close."""
+    if db_path not in _initialized:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if db_path not in _initialized:
+            conn.executescript(SCHEMA)
+            _initialized.add(db_path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def upsert_session(conn, data, file_mtime=None):
+    conn.execute(
+        "INSERT OR REPLACE INTO sessions "
+        "(session_id, saved_at, duration_minutes, total_faces_analyzed, data, "
+        "file_mtime) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            data["session_id"],
+            data.get("saved_at", ""),
+            data.get("duration_minutes"),
+            data.get("total_faces_analyzed"),
+            json.dumps(data),
+            file_mtime
+        )
+    )
+
+# ===============================
+# JSON IMPORT
+# ===============================
+def import_json_sessions(session_dir, db_path=DB_PATH):
+    """
+    Load session_*.json files that are new or changed since they were
+    imported (by file mtime) and drop the rows whose file was deleted,
+    so the JSON folder stays the source of truth. Returns the number of
+    sessions imported.
+    """
+    with connect(db_path) as conn:
+        known = dict(conn.execute("SELECT session_id, file_mtime FROM sessions"))
+        present = set()
+
+        imported = 0
+        for file in sorted(os.listdir(session_dir)):
+            if not (file.startswith("session_") and file.endswith(".json")):
+                continue
+            session_id = file[len("session_"):-len(".json")]
+            path = os.path.join(session_dir, file)
+            present.add(session_id)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if known.get(session_id) == mtime:
+                continue
+            try:
+                with open(path) as f:
+                    upsert_session(conn, json.load(f), mtime)
+                imported += 1
+            except (ValueError, KeyError):
+                continue
+
+        conn.executemany("DELETE FROM sessions WHERE session_id = ?",
+                         [(sid,) for sid in known.keys() - present])
+        return imported
+
+# ===============================
+# QUERIES
+# ===============================
+def save(data, file_mtime=None, db_path=DB_PATH):
+    with connect(db_path) as conn:
+        upsert_session(conn, data, file_mtime)
+
+def get(session_id, db_path=DB_PATH):
+    with connect(db_path) as conn:
+        row = conn.execute(
+            "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+def list_sessions(limit=None, offset=0, newest_first=True, db_path=DB_PATH):
+    order = "DESC" if newest_first else "ASC"
+    query = f"SELECT data FROM sessions ORDER BY saved_at {order}"
+    params = ()
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params = (limit, offset)
+
+    with connect(db_path) as conn:
+        rows = conn.execute(query, params).fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+def list_session_ids(newest_first=True, db_path=DB_PATH):
+    order = "DESC" if newest_first else "ASC"
+    with connect(db_path) as conn:
+        rows = conn.execute(
+            f"SELECT session_id FROM sessions ORDER BY saved_at {order}"
+        ).fetchall()
+    return [r[0] for r in rows]
+
+def count_sessions(db_path=DB_PATH):
+    with connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+def saved_times(db_path=DB_PATH):
+    """{session_id: saved_at} without parsing the session JSON."""
+    with connect(db_path) as conn:
+        return dict(conn.execute("SELECT session_id, saved_at FROM sessions"))
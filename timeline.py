@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+import numpy as np
+from emotion_utils import EMOTIONS
+
+TIMELINE_DIR = os.path.join("data", "timelines")
+
+EMOTION_INDEX = {e: i for i, e in enumerate(EMOTIONS)}
+
+# one fixed-width 12 byte record per classification:
+#   t: seconds since session start, emotion: index into EMOTIONS,
+#   face: face/track id (-1 when unknown); track ids only ever grow, so
+#   they need the full 32 bits in long multi-face sessions
+EVENT_DTYPE = np.dtype({
+    "names": ["t", "emotion", "face"],
+    "formats": ["<f4", "u1", "<i4"],
+    "offsets": [0, 4, 8],
+    "itemsize": 12
+})
+
+def timeline_path(session_id):
+    return os.path.join(TIMELINE_DIR, f"{session_id}.bin")
+
+# ===============================
+# APPEND-ONLY WRITER
+# ===============================
+class TimelineWriter:
+    """Appends fixed-width event records to data/timelines/<id>.bin."""
+
+    def __init__(self, session_id, start_time=None, flush_every=64):
+        os.makedirs(TIMELINE_DIR, exist_ok=True)
+        self.path = timeline_path(session_id)
+        self.start_time = time.time() if start_time is None else start_time
+        self.flush_every = flush_every
+
+        self.file = open(self.path, "ab")
+        self.lock = threading.Lock()
+        self.pending = []
+        self.events = 0
+
+    def record(self, emotion, face_id=None, count=1, t=None):
+        t = (time.time() if t is None else t) - self.start_time
+        face = -1 if face_id is None else int(face_id)
+
+        with self.lock:
+            for _ in range(count):
+                self.pending.append((t, EMOTION_INDEX[emotion], face))
+            self.events += count
+            if len(self.pending) >= self.flush_every:
+                self.flush_locked()
+
+    def flush_locked(self):
+        if self.pending:
+            self.file.write(np.array(self.pending, dtype=EVENT_DTYPE).tobytes())
+            self.file.flush()
+            self.pending = []
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def close(self):
+        with self.lock:
+            self.flush_locked()
+            self.file.close()
+
+
+# ===============================
+# READING & DOWNSAMPLING
+# ===============================
+def load_events(session_id):
+    """Memory-mapped view of a session's events, or None."""
+    path = timeline_path(session_id)
+    if not os.path.exists(path):
+        return None
+
+    n = os.path.getsize(path) // EVENT_DTYPE.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    return np.memmap(path, dtype=EVENT_DTYPE, mode="r", shape=(n,))
+
+def downsample(events, buckets, duration=None):
+    """Per-emotion event counts in `buckets` equal time bins."""
+    buckets = max(int(buckets), 1)
+    if duration is None:
+        duration = float(events["t"].max()) if len(events) else 0.0
+    duration = max(duration, 1e-6)
+
+    idx = np.floor(events["t"] / duration * buckets).astype(np.int64)
+    np.clip(idx, 0, buckets - 1, out=idx)
+
+    flat = idx * len(EMOTIONS) + events["emotion"].astype(np.int64)
+    counts = np.bincount(flat, minlength=buckets * len(EMOTIONS))
+    counts = counts.reshape(buckets, len(EMOTIONS))
+
+    return {
+        "buckets": buckets,
+        "bucket_seconds": duration / buckets,
+        "start": (np.arange(buckets) * duration / buckets).round(2).tolist(),
+        "counts": {e: counts[:, i].tolist() for i, e in enumerate(EMOTIONS)},
+        "total_events": int(len(events))
+    }